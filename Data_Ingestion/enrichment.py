@@ -0,0 +1,144 @@
+"""
+Ingestion-stage enrichment for EcommerceProducts.
+
+Builds a cleaned, compact `product_summary` for every product so the backend and the
+UI can read one short field instead of truncating and cleaning the full description
+and bullet points on every request.
+
+Backfill an existing collection with:
+
+    python enrichment.py --backfill
+"""
+
+import re
+import html
+import argparse
+from typing import Dict, List, Optional
+
+SUMMARY_PROPERTY = "product_summary"
+SUMMARY_MAX_CHARS = 300
+SUMMARY_MAX_BULLETS = 3
+
+_BR_TAG = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+def clean_text(text: Optional[str]) -> str:
+    """Turn <br> markup into line breaks, drop other tags and entities, collapse whitespace"""
+    if not text:
+        return ""
+    text = html.unescape(_BR_TAG.sub("\n", text))
+    text = _HTML_TAG.sub(" ", text)
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return "\n".join(line for line in lines if line)
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text at a word boundary so it fits within max_chars"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars - 3].rsplit(" ", 1)[0].rstrip(" ,;:-")
+    return cut + "..."
+
+def build_product_summary(
+    title: Optional[str],
+    description: Optional[str],
+    bullet_points: Optional[str],
+    max_chars: int = SUMMARY_MAX_CHARS
+) -> str:
+    """
+    Build a compact summary: the lead sentence of the description followed by the first
+    few feature bullets that are not just a repeat of the title
+    """
+    title_clean = clean_text(title).lower()
+    parts: List[str] = []
+
+    description_clean = clean_text(description).replace("\n", " ")
+    if description_clean:
+        parts.append(_SENTENCE_SPLIT.split(description_clean, maxsplit=1)[0].rstrip("."))
+
+    bullets = [line.strip(" -•") for line in clean_text(bullet_points).splitlines()]
+    bullets = [line for line in bullets if line and line.lower() != title_clean]
+    parts.extend(bullets[:SUMMARY_MAX_BULLETS])
+
+    if not parts:
+        return _truncate(clean_text(title), max_chars)
+
+    return _truncate("; ".join(parts), max_chars)
+
+def enrich_properties(properties: Dict) -> Dict:
+    """Add the product_summary property to a product's properties dict"""
+    properties[SUMMARY_PROPERTY] = build_product_summary(
+        properties.get("product_title"),
+        properties.get("product_description"),
+        properties.get("product_bullet_point")
+    )
+    return properties
+
+def ensure_summary_property(collection) -> None:
+    """Add the product_summary property to an existing collection if it is missing"""
+    import weaviate.classes.config as wvc
+
+    existing = {prop.name for prop in collection.config.get().properties}
+    if SUMMARY_PROPERTY not in existing:
+        collection.config.add_property(
+            wvc.Property(name=SUMMARY_PROPERTY, data_type=wvc.DataType.TEXT, skip_vectorization=True)
+        )
+        print(f"Added '{SUMMARY_PROPERTY}' property to collection '{collection.name}'")
+
+def backfill_product_summaries(collection, report_every: int = 10000) -> int:
+    """
+    Compute product_summary for objects that do not have one yet. Only the new
+    property is patched, leaving the vectorized text fields untouched.
+    """
+    ensure_summary_property(collection)
+
+    updated = 0
+    for obj in collection.iterator(
+        return_properties=["product_title", "product_description", "product_bullet_point", SUMMARY_PROPERTY]
+    ):
+        if obj.properties.get(SUMMARY_PROPERTY):
+            continue
+
+        summary = build_product_summary(
+            obj.properties.get("product_title"),
+            obj.properties.get("product_description"),
+            obj.properties.get("product_bullet_point")
+        )
+        collection.data.update(uuid=obj.uuid, properties={SUMMARY_PROPERTY: summary})
+        updated += 1
+
+        if updated % report_every == 0:
+            print(f"Backfilled {updated} product summaries")
+
+    print(f"Backfill complete: {updated} product summaries written")
+    return updated
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Product summary enrichment for EcommerceProducts")
+    parser.add_argument("--backfill", action="store_true", help="Write product_summary for existing objects")
+    parser.add_argument("--collection", default="EcommerceProducts", help="Weaviate collection name")
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.print_help()
+        return
+
+    import os
+    import weaviate
+    from weaviate.classes.init import Auth
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.environ["WEAVIATE_URL"],
+        auth_credentials=Auth.api_key(os.environ["WEAVIATE_API_KEY"]),
+        headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
+    )
+    try:
+        backfill_product_summaries(client.collections.get(args.collection))
+    finally:
+        client.close()
+        print("Connection closed.")
+
+if __name__ == "__main__":
+    main()
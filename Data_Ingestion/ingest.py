@@ -0,0 +1,302 @@
+"""
+Streaming ingestion of the products parquet into the EcommerceProducts collection.
+
+Reads the parquet as Arrow record batches with only the ingested columns projected, so
+memory stays bounded by one record batch instead of the whole catalogue. Properties are
+built column-wise per record batch and fed to fixed-size batches sent with several
+concurrent requests. Progress lines report objects per second and failed objects.
+
+Object UUIDs are derived from product_id, so ingesting a product again overwrites its
+object instead of adding a duplicate. After each record batch is acknowledged, a
+checkpoint file records how far the file has been committed; a rerun resumes from
+there, and a changed parquet is upserted from the start.
+
+Run with:
+
+    python ingest.py dataset/cleaned_shopping_queries_dataset_products.parquet
+
+and add --restart to ignore an existing checkpoint.
+"""
+
+import os
+import json
+import time
+import argparse
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from weaviate.util import generate_uuid5
+
+from enrichment import SUMMARY_PROPERTY, build_product_summary
+
+COLLECTION_NAME = "EcommerceProducts"
+DEFAULT_PARQUET_PATH = "dataset/cleaned_shopping_queries_dataset_products.parquet"
+
+# Parquet columns read for ingestion; each becomes the property of the same name
+INGEST_COLUMNS = [
+    "product_id",
+    "product_title",
+    "product_description",
+    "product_bullet_point",
+    "product_brand",
+    "product_color",
+]
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_CONCURRENT_REQUESTS = 4
+DEFAULT_READ_ROWS = 10000
+
+def iter_record_batches(
+    path: str,
+    read_rows: int = DEFAULT_READ_ROWS,
+    start_row_group: int = 0,
+    skip_rows: int = 0
+) -> Iterator[Tuple[int, pa.RecordBatch]]:
+    """
+    Yield (row group index, record batch) pairs covering the file in order, reading only
+    INGEST_COLUMNS and at most read_rows rows at a time. Row groups before start_row_group
+    are not read at all, and the first skip_rows rows of start_row_group are dropped.
+    """
+    parquet_file = pq.ParquetFile(path)
+    for row_group in range(start_row_group, parquet_file.num_row_groups):
+        for record_batch in parquet_file.iter_batches(
+            batch_size=read_rows, row_groups=[row_group], columns=INGEST_COLUMNS
+        ):
+            if skip_rows >= record_batch.num_rows:
+                skip_rows -= record_batch.num_rows
+                continue
+            if skip_rows:
+                record_batch = record_batch.slice(skip_rows)
+                skip_rows = 0
+            yield row_group, record_batch
+
+        skip_rows = 0
+
+def object_uuid(product_id: str) -> str:
+    """Deterministic object UUID for a product, so re-ingesting it replaces the same object"""
+    return generate_uuid5(product_id)
+
+def parquet_fingerprint(path: str) -> Dict:
+    """Identify a parquet file's contents cheaply, from its size and footer metadata"""
+    metadata = pq.ParquetFile(path).metadata
+    return {
+        "size": os.path.getsize(path),
+        "num_rows": metadata.num_rows,
+        "num_row_groups": metadata.num_row_groups
+    }
+
+def load_checkpoint(checkpoint_path: str, collection_name: str, fingerprint: Dict) -> Optional[Dict]:
+    """
+    Return the checkpoint left by an earlier run over the same file and collection, or
+    None when there is none or it was written for a different file
+    """
+    if not os.path.exists(checkpoint_path):
+        return None
+
+    with open(checkpoint_path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+
+    if checkpoint.get("collection") != collection_name or checkpoint.get("fingerprint") != fingerprint:
+        print(f"Checkpoint {checkpoint_path} was written for a different file or collection, starting over")
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint_path: str, checkpoint: Dict) -> None:
+    """Atomically replace the checkpoint file"""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+def build_properties(record_batch: pa.RecordBatch) -> List[Dict]:
+    """
+    Build the properties of every product in a record batch. Nulls are replaced by empty
+    strings with Arrow compute, one column at a time, instead of per row.
+    """
+    columns = {
+        name: pc.fill_null(record_batch.column(name).cast(pa.string()), "").to_pylist()
+        for name in INGEST_COLUMNS
+    }
+    columns[SUMMARY_PROPERTY] = [
+        build_product_summary(title, description, bullet_points)
+        for title, description, bullet_points in zip(
+            columns["product_title"], columns["product_description"], columns["product_bullet_point"]
+        )
+    ]
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+def ensure_collection(client, collection_name: str = COLLECTION_NAME):
+    """Create the products collection if it does not exist yet and return it"""
+    import weaviate.classes.config as wvc
+
+    if not client.collections.exists(collection_name):
+        print(f"Creating collection '{collection_name}'...")
+        client.collections.create(
+            name=collection_name,
+            vectorizer_config=wvc.Configure.Vectorizer.text2vec_openai(),
+            properties=[
+                # Properties for semantic search
+                wvc.Property(name="product_title", data_type=wvc.DataType.TEXT),
+                wvc.Property(name="product_description", data_type=wvc.DataType.TEXT),
+                wvc.Property(name="product_bullet_point", data_type=wvc.DataType.TEXT),
+
+                # Properties for filtering ONLY (vectorization is skipped)
+                wvc.Property(name="product_id", data_type=wvc.DataType.TEXT, skip_vectorization=True),
+                wvc.Property(name="product_brand", data_type=wvc.DataType.TEXT, skip_vectorization=True),
+                wvc.Property(name="product_color", data_type=wvc.DataType.TEXT, skip_vectorization=True),
+
+                # Compact cleaned summary read by the backend and UI (see enrichment.py)
+                wvc.Property(name=SUMMARY_PROPERTY, data_type=wvc.DataType.TEXT, skip_vectorization=True),
+            ]
+        )
+    return client.collections.get(collection_name)
+
+def ingest_parquet(
+    collection,
+    path: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrent_requests: int = DEFAULT_CONCURRENT_REQUESTS,
+    read_rows: int = DEFAULT_READ_ROWS,
+    checkpoint_path: Optional[str] = None,
+    restart: bool = False
+) -> Dict:
+    """
+    Stream the parquet at path into collection and return the number of objects sent,
+    failed objects and overall objects per second. With a checkpoint_path, resumes after
+    the rows an earlier run committed unless restart is set.
+    """
+    fingerprint = parquet_fingerprint(path)
+    checkpoint = None
+    if checkpoint_path and not restart:
+        checkpoint = load_checkpoint(checkpoint_path, collection.name, fingerprint)
+    if checkpoint is None:
+        checkpoint = {
+            "parquet": os.path.abspath(path),
+            "collection": collection.name,
+            "fingerprint": fingerprint,
+            "row_group": 0,  # first row group not fully committed
+            "rows": 0,  # rows of that row group already committed
+            "objects": 0,
+            "complete": False
+        }
+    elif checkpoint["complete"]:
+        print(f"{path} is already fully ingested into '{collection.name}'; use --restart to upsert it again")
+        return {"sent": 0, "failed": 0, "seconds": 0.0, "objects_per_second": 0.0}
+    else:
+        print(
+            f"Resuming from checkpoint: row group {checkpoint['row_group']}, row {checkpoint['rows']} "
+            f"({checkpoint['objects']} objects already committed)"
+        )
+
+    start_time = time.time()
+    sent = 0
+    # The checkpoint only ever covers a prefix of the file in which every object was
+    # written, so it stops advancing at the first record batch with failures
+    checkpoint_blocked = False
+
+    with collection.batch.fixed_size(batch_size=batch_size, concurrent_requests=concurrent_requests) as batch:
+        for row_group, record_batch in iter_record_batches(
+            path, read_rows, start_row_group=checkpoint["row_group"], skip_rows=checkpoint["rows"]
+        ):
+            errors_before = batch.number_errors
+            for properties in build_properties(record_batch):
+                batch.add_object(properties=properties, uuid=object_uuid(properties["product_id"]))
+            sent += record_batch.num_rows
+
+            if checkpoint_path and not checkpoint_blocked:
+                # Wait until this record batch is acknowledged before recording it
+                batch.flush()
+                if batch.number_errors > errors_before:
+                    checkpoint_blocked = True
+                    print(f"Row group {row_group} has failed objects, checkpoint stays at row group {checkpoint['row_group']}")
+                else:
+                    if row_group != checkpoint["row_group"]:
+                        checkpoint["row_group"], checkpoint["rows"] = row_group, 0
+                    checkpoint["rows"] += record_batch.num_rows
+                    checkpoint["objects"] += record_batch.num_rows
+                    save_checkpoint(checkpoint_path, checkpoint)
+
+            elapsed = time.time() - start_time
+            print(
+                f"Row group {row_group}: {sent} objects sent, {sent / elapsed:.0f} objects/s, "
+                f"{batch.number_errors} failed"
+            )
+
+    # Leaving the context flushed the last batch, so the totals are final here
+    elapsed = time.time() - start_time
+    failed_objects = collection.batch.failed_objects
+    for failed in failed_objects[:10]:
+        print(f"Failed object {failed.object_.properties.get('product_id')}: {failed.message}")
+
+    if checkpoint_path and not checkpoint_blocked and not failed_objects:
+        checkpoint["row_group"], checkpoint["rows"] = fingerprint["num_row_groups"], 0
+        checkpoint["complete"] = True
+        save_checkpoint(checkpoint_path, checkpoint)
+    elif checkpoint_path:
+        print(f"Rerun to retry from the checkpoint in {checkpoint_path}; already written objects are overwritten, not duplicated")
+
+    stats = {
+        "sent": sent,
+        "failed": len(failed_objects),
+        "seconds": round(elapsed, 1),
+        "objects_per_second": round(sent / elapsed, 1) if elapsed else 0.0
+    }
+    print(
+        f"Ingestion complete: {stats['sent'] - stats['failed']} of {stats['sent']} objects written in "
+        f"{stats['seconds']}s ({stats['objects_per_second']} objects/s), {stats['failed']} failed"
+    )
+    return stats
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stream the products parquet into Weaviate")
+    parser.add_argument("parquet", nargs="?", default=DEFAULT_PARQUET_PATH, help="Products parquet file")
+    parser.add_argument("--collection", default=COLLECTION_NAME, help="Weaviate collection name")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Objects per batch request")
+    parser.add_argument(
+        "--concurrent-requests", type=int, default=DEFAULT_CONCURRENT_REQUESTS,
+        help="Batch requests in flight at once"
+    )
+    parser.add_argument(
+        "--read-rows", type=int, default=DEFAULT_READ_ROWS,
+        help="Rows read from the parquet per record batch"
+    )
+    parser.add_argument(
+        "--checkpoint", default=None,
+        help="Checkpoint file (default: <parquet>.checkpoint.json)"
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and upsert the whole file")
+    args = parser.parse_args()
+
+    import weaviate
+    from weaviate.classes.init import Auth
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.environ["WEAVIATE_URL"],
+        auth_credentials=Auth.api_key(os.environ["WEAVIATE_API_KEY"]),
+        headers={"X-OpenAI-Api-Key": os.environ["OPENAI_API_KEY"]}
+    )
+    try:
+        collection = ensure_collection(client, args.collection)
+        ingest_parquet(
+            collection,
+            args.parquet,
+            batch_size=args.batch_size,
+            concurrent_requests=args.concurrent_requests,
+            read_rows=args.read_rows,
+            checkpoint_path=args.checkpoint or f"{args.parquet}.checkpoint.json",
+            restart=args.restart
+        )
+    finally:
+        client.close()
+        print("Connection closed.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""
+Benchmarks for the search backend.
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.load_test --rps 20 --duration 30
+"""
@@ -0,0 +1,272 @@
+"""
+In-process stand-ins for Weaviate and OpenAI with configurable latency distributions.
+
+The Weaviate stand-in replaces the client returned by weaviate.connect_to_* and answers
+near_text/fetch_objects from a synthetic catalogue. The OpenAI stand-in is a real HTTP
+server implementing the Responses and Chat Completions endpoints, so the backend's
+AsyncOpenAI client, scheduler and header handling run unmodified against it.
+"""
+
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class LatencyModel:
+    """
+    Log-normal latency distribution described by its median and 99th percentile
+    """
+
+    def __init__(self, median_ms: float, p99_ms: Optional[float] = None):
+        self.median_ms = median_ms
+        self.p99_ms = p99_ms or median_ms
+        # z(0.99) ~= 2.326 for a standard normal distribution
+        self.sigma = math.log(self.p99_ms / median_ms) / 2.326 if median_ms > 0 and self.p99_ms > median_ms else 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        """Parse 'median_ms' or 'median_ms:p99_ms'"""
+        parts = [float(part) for part in spec.split(":")]
+        return cls(parts[0], parts[1] if len(parts) > 1 else None)
+
+    def sample(self) -> float:
+        """Draw one latency in seconds"""
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+
+    def __repr__(self) -> str:
+        return f"LatencyModel(median={self.median_ms}ms, p99={self.p99_ms}ms)"
+
+# --- Weaviate ---------------------------------------------------------------------------
+
+class FakeObject:
+    def __init__(self, properties: Dict, score: float):
+        self.properties = properties
+        self.uuid = uuid.uuid5(uuid.NAMESPACE_URL, properties["product_id"])
+        self.metadata = type("Metadata", (), {"score": score})()
+
+class FakeQueryReturn:
+    def __init__(self, objects: List[FakeObject]):
+        self.objects = objects
+
+def _equality_filters(filters) -> List[tuple]:
+    """Extract (property, value) pairs from Filter.all_of/by_property(...).equal(...) trees"""
+    if filters is None:
+        return []
+    if hasattr(filters, "filters"):
+        return [pair for child in filters.filters for pair in _equality_filters(child)]
+    return [(filters.target, filters.value)]
+
+class FakeQuery:
+    def __init__(self, catalogue: List[Dict], latency: LatencyModel):
+        self.catalogue = catalogue
+        self.latency = latency
+        self.calls = 0
+
+    def _project(self, properties: Dict, return_properties: Optional[List[str]]) -> Dict:
+        if return_properties is None:
+            return dict(properties)
+        return {name: properties.get(name) for name in return_properties}
+
+    def near_text(self, query: str, limit: int = 10, filters=None, return_properties=None, **kwargs) -> FakeQueryReturn:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+
+        candidates = self.catalogue
+        for prop, value in _equality_filters(filters):
+            candidates = [product for product in candidates if product.get(prop) == value]
+
+        # Deterministic pseudo-ranking: products sharing query words first, then a hash-seeded rotation
+        words = set(query.lower().split())
+        offset = int(hashlib.md5(query.encode("utf-8")).hexdigest(), 16) % max(len(candidates), 1)
+        rotated = candidates[offset:] + candidates[:offset]
+        ranked = sorted(rotated, key=lambda product: -len(words & set(product["product_title"].lower().split())))
+
+        return FakeQueryReturn([
+            FakeObject(self._project(product, return_properties), score=1.0 - rank / (limit + 1))
+            for rank, product in enumerate(ranked[:limit])
+        ])
+
+    def fetch_objects(self, limit: int = 10, return_properties=None, **kwargs) -> FakeQueryReturn:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return FakeQueryReturn([
+            FakeObject(self._project(product, return_properties), score=0.0) for product in self.catalogue[:limit]
+        ])
+
+class FakeProperty:
+    def __init__(self, name: str):
+        self.name = name
+
+class FakeCollectionConfig:
+    """Answers collection.config.get() with the properties present in the catalogue"""
+
+    def __init__(self, catalogue: List[Dict]):
+        names = dict.fromkeys(name for product in catalogue[:1] for name in product)
+        self.properties = [FakeProperty(name) for name in names]
+        self.calls = 0
+
+    def get(self) -> "FakeCollectionConfig":
+        self.calls += 1
+        return self
+
+class FakeCollection:
+    def __init__(self, name: str, catalogue: List[Dict], latency: LatencyModel):
+        self.name = name
+        self.query = FakeQuery(catalogue, latency)
+        self.config = FakeCollectionConfig(catalogue)
+        self._catalogue = catalogue
+
+    def __len__(self) -> int:
+        return len(self._catalogue)
+
+class FakeCollections:
+    def __init__(self, collections: Dict[str, FakeCollection]):
+        self._collections = collections
+
+    def get(self, name: str) -> FakeCollection:
+        return self._collections[name]
+
+    def exists(self, name: str) -> bool:
+        return name in self._collections
+
+class FakeWeaviateClient:
+    def __init__(self, catalogue: List[Dict], latency: LatencyModel, collection_name: str = "EcommerceProducts"):
+        self.collections = FakeCollections({collection_name: FakeCollection(collection_name, catalogue, latency)})
+
+    def is_ready(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+def install_fake_weaviate(catalogue: List[Dict], latency: LatencyModel) -> FakeWeaviateClient:
+    """Make weaviate.connect_to_local/connect_to_weaviate_cloud return the fake client"""
+    import weaviate
+
+    fake_client = FakeWeaviateClient(catalogue, latency)
+    weaviate.connect_to_local = lambda *args, **kwargs: fake_client
+    weaviate.connect_to_weaviate_cloud = lambda *args, **kwargs: fake_client
+    logger.info(f"Installed fake Weaviate with {len(catalogue)} products and {latency}")
+    return fake_client
+
+# --- OpenAI -----------------------------------------------------------------------------
+
+RATE_LIMIT_HEADERS = {
+    "x-ratelimit-limit-requests": "10000",
+    "x-ratelimit-remaining-requests": "9999",
+    "x-ratelimit-reset-requests": "6ms",
+    "x-ratelimit-limit-tokens": "2000000",
+    "x-ratelimit-remaining-tokens": "1999000",
+    "x-ratelimit-reset-tokens": "30ms",
+}
+
+SUMMARY_TEXT = (
+    "I found several great matches for your search, covering a range of brands and colors. "
+    "Take a look at the results on the right and ask me to compare any of them."
+)
+
+def response_payload(body: Dict) -> Dict:
+    """Responses API result body for a request body, always answering with SUMMARY_TEXT"""
+    input_tokens = len(str(body.get("input", "")) + str(body.get("instructions", ""))) // 4
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "status": "completed",
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "output": [{
+            "type": "message",
+            "id": f"msg_{uuid.uuid4().hex}",
+            "status": "completed",
+            "role": "assistant",
+            "content": [{"type": "output_text", "text": SUMMARY_TEXT, "annotations": []}]
+        }],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": len(SUMMARY_TEXT) // 4,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + len(SUMMARY_TEXT) // 4
+        }
+    }
+
+def create_fake_openai_app(response_latency: LatencyModel, completion_latency: LatencyModel):
+    """Build an ASGI app implementing POST /v1/responses and /v1/chat/completions"""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Fake OpenAI")
+    app.state.counts = {"responses": 0, "completions": 0}
+
+    @app.post("/v1/responses")
+    async def create_response(request: Request):
+        body = await request.json()
+        app.state.counts["responses"] += 1
+        await asyncio.sleep(response_latency.sample())
+        return JSONResponse(headers=RATE_LIMIT_HEADERS, content=response_payload(body))
+
+    @app.post("/v1/chat/completions")
+    async def create_completion(request: Request):
+        body = await request.json()
+        app.state.counts["completions"] += 1
+        await asyncio.sleep(completion_latency.sample())
+        last_message = body["messages"][-1]["content"]
+        rewritten = " ".join(last_message.split("New User Message:")[-1].split()[:4]) or "products"
+        return JSONResponse(headers=RATE_LIMIT_HEADERS, content={
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": rewritten}
+            }],
+            "usage": {"prompt_tokens": len(last_message) // 4, "completion_tokens": 4, "total_tokens": len(last_message) // 4 + 4}
+        })
+
+    return app
+
+class BackgroundServer:
+    """Run an ASGI app under uvicorn in a daemon thread"""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        import uvicorn
+
+        self.app = app
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self, timeout: float = 30) -> "BackgroundServer":
+        self.thread.start()
+        deadline = time.time() + timeout
+        while not self.server.started:
+            if time.time() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"Server on {self.host}:{self.port} failed to start")
+            time.sleep(0.05)
+
+        # Resolve the real port when an ephemeral one (0) was requested
+        self.port = self.server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
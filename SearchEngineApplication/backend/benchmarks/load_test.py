@@ -0,0 +1,197 @@
+"""
+End-to-end load test for the backend against local Weaviate and OpenAI stand-ins.
+
+Starts the fake OpenAI server and the backend app in-process, then drives an open-loop
+request stream at a target RPS across /search, /chat/start and /chat/message and
+reports p50/p95/p99 latency and error rates per endpoint.
+
+    python -m benchmarks.load_test --rps 20 --duration 30 --output load_results.json
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.fakes import LatencyModel, BackgroundServer, create_fake_openai_app, install_fake_weaviate
+from benchmarks.synthetic import generate_catalogue, generate_queries, BRANDS, COLORS
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+class LoadDriver:
+    """
+    Open-loop load generator: requests are issued on a Poisson schedule regardless of
+    how long earlier ones take, so server slowdowns show up as latency, not lower load
+    """
+
+    def __init__(self, base_url: str, rps: float, duration: float, mix: Dict[str, float], filter_rate: float, seed: int):
+        self.base_url = base_url
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix
+        self.filter_rate = filter_rate
+        self.rng = random.Random(seed)
+        self.queries = generate_queries(10000, seed=seed)
+        self.sessions: List[str] = []
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def _filters(self) -> Dict:
+        filters = {}
+        if self.rng.random() < self.filter_rate:
+            filters["brand_filter"] = self.rng.choice(BRANDS)
+        if self.rng.random() < self.filter_rate:
+            filters["color_filter"] = self.rng.choice(COLORS)
+        return filters
+
+    def _next_request(self) -> tuple:
+        endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if endpoint == "chat_message" and not self.sessions:
+            endpoint = "chat_start"
+
+        query = self.rng.choice(self.queries)
+        if endpoint == "search":
+            return endpoint, "/search", {"query": query, "limit": 10, **self._filters()}
+        if endpoint == "chat_start":
+            return endpoint, "/chat/start", {"query": query, "user_id": f"user-{self.rng.randint(1, 500)}", **self._filters()}
+        return endpoint, "/chat/message", {
+            "session_id": self.rng.choice(self.sessions),
+            "message": f"show me something like {query}",
+            **self._filters()
+        }
+
+    async def _issue(self, client, endpoint: str, path: str, payload: Dict) -> None:
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+            elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                self.latencies[endpoint].append(elapsed)
+                if endpoint == "chat_start":
+                    self.sessions.append(response.json()["session_id"])
+            else:
+                self.errors[endpoint][f"http_{response.status_code}"] += 1
+        except Exception as e:
+            self.errors[endpoint][type(e).__name__] += 1
+
+    async def run(self) -> None:
+        import httpx
+
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=200)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=120, limits=limits) as client:
+            tasks = []
+            start = time.perf_counter()
+            next_at = start
+            while next_at - start < self.duration:
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(self._issue(client, *self._next_request())))
+                next_at += self.rng.expovariate(self.rps)
+
+            print(f"Issued {len(tasks)} requests in {time.perf_counter() - start:.1f}s, waiting for completion...")
+            await asyncio.gather(*tasks)
+
+    def report(self) -> Dict:
+        results = {}
+        for endpoint in self.mix:
+            latencies = self.latencies.get(endpoint, [])
+            errors = dict(self.errors.get(endpoint, {}))
+            total = len(latencies) + sum(errors.values())
+            results[endpoint] = {
+                "requests": total,
+                "errors": errors,
+                "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+            }
+        return results
+
+def print_report(results: Dict) -> None:
+    print(f"\n{'endpoint':<14}{'requests':>10}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in results.items():
+        print(
+            f"{endpoint:<14}{stats['requests']:>10}{stats['error_rate'] * 100:>8.1f}%"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        )
+        for error, count in stats["errors"].items():
+            print(f"{'':<14}  {error}: {count}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the backend against local Weaviate/OpenAI stand-ins")
+    parser.add_argument("--rps", type=float, default=10, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to generate load for")
+    parser.add_argument("--mix", default="search=0.5,chat_start=0.3,chat_message=0.2",
+                        help="Endpoint weights, e.g. search=0.5,chat_start=0.3,chat_message=0.2")
+    parser.add_argument("--filter-rate", type=float, default=0.2, help="Probability of each brand/color filter")
+    parser.add_argument("--catalogue-size", type=int, default=5000, help="Synthetic products served by the fake Weaviate")
+    parser.add_argument("--weaviate-latency", default="40:250", help="near_text latency 'median_ms[:p99_ms]'")
+    parser.add_argument("--response-latency", default="900:3000", help="Responses API latency 'median_ms[:p99_ms]'")
+    parser.add_argument("--completion-latency", default="300:1200", help="Chat Completions latency 'median_ms[:p99_ms]'")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    mix = {name: float(weight) for name, weight in (part.split("=") for part in args.mix.split(","))}
+
+    fake_openai = BackgroundServer(create_fake_openai_app(
+        LatencyModel.parse(args.response_latency),
+        LatencyModel.parse(args.completion_latency)
+    )).start()
+
+    # The backend reads these at import time, so they must be set before main is imported
+    os.environ["OPENAI_API_KEY"] = "sk-load-test"
+    os.environ["OPENAI_BASE_URL"] = f"{fake_openai.url}/v1"
+    os.environ["WEAVIATE_URL"] = "http://fake-weaviate:8080"
+    os.environ.pop("WEAVIATE_API_KEY", None)
+    os.environ.setdefault("PREWARM_ENABLED", "false")
+    os.environ.setdefault("QUERY_LOG_PATH", "")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    install_fake_weaviate(generate_catalogue(args.catalogue_size), LatencyModel.parse(args.weaviate_latency))
+
+    from main import app
+    backend = BackgroundServer(app).start()
+    print(f"Backend at {backend.url}, fake OpenAI at {fake_openai.url}")
+    print(f"Target {args.rps} RPS for {args.duration}s, mix {mix}")
+
+    driver = LoadDriver(backend.url, args.rps, args.duration, mix, args.filter_rate, args.seed)
+    wall_start = time.perf_counter()
+    asyncio.run(driver.run())
+    wall_time = time.perf_counter() - wall_start
+
+    results = driver.report()
+    print_report(results)
+
+    completed = sum(len(latencies) for latencies in driver.latencies.values())
+    print(f"\nAchieved throughput: {completed / wall_time:.1f} successful requests/s")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "config": vars(args),
+                "wall_time_seconds": round(wall_time, 2),
+                "throughput_rps": round(completed / wall_time, 2),
+                "endpoints": results,
+                "fake_openai_calls": fake_openai.app.state.counts,
+            }, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+    backend.stop()
+    fake_openai.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Micro-benchmarks for the pure-Python per-request hot paths.
+
+Each case runs against synthetic catalogue data, is warmed up first, and is then timed
+with timeit over several repeats; the minimum and median per-call times are reported.
+Results can be written as JSON and compared with an earlier run:
+
+    python -m benchmarks.micro_benchmarks --output micro_results.json
+    python -m benchmarks.micro_benchmarks --compare micro_results.json
+"""
+
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import statistics
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.fakes import LatencyModel, install_fake_weaviate, response_payload
+from benchmarks.synthetic import generate_catalogue
+
+class Benchmark:
+    """One named, zero-argument callable with optional per-repeat setup"""
+
+    def __init__(self, name: str, func: Callable[[], object], setup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+
+    def run(self, repeat: int, min_time: float, warmup: int) -> Dict:
+        for _ in range(warmup):
+            if self.setup:
+                self.setup()
+            self.func()
+
+        if self.setup:
+            # Setup has to run before every call, so it is timed per call and subtracted
+            def timed():
+                self.setup()
+                self.func()
+            overhead = _per_call(lambda: self.setup(), repeat, min_time)
+        else:
+            timed = self.func
+            overhead = 0.0
+
+        timer = timeit.Timer(timed)
+        number = _calls_for(timer, min_time)
+        samples = [max(total / number - overhead, 0.0) for total in timer.repeat(repeat=repeat, number=number)]
+
+        return {
+            "calls_per_repeat": number,
+            "repeats": repeat,
+            "min_us": round(min(samples) * 1e6, 3),
+            "median_us": round(statistics.median(samples) * 1e6, 3),
+            "stdev_us": round(statistics.pstdev(samples) * 1e6, 3),
+        }
+
+def _calls_for(timer: timeit.Timer, min_time: float) -> int:
+    """Smallest power-of-ten call count whose total run takes at least min_time"""
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            return number
+        number *= 10
+
+def _per_call(func: Callable[[], object], repeat: int, min_time: float) -> float:
+    timer = timeit.Timer(func)
+    number = _calls_for(timer, min_time)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def build_benchmarks(catalogue: List[Dict], results_per_query: int) -> List[Benchmark]:
+    """Construct the benchmark cases; backend modules are imported here, after the fakes are installed"""
+    from openai._models import construct_type
+    from openai.types.responses import Response
+    from models import Product
+    from weaviate_client import transform_product_properties
+    from client import _extract_response_text
+    from context_builder import build_products_context, snippet_cache
+    from helpers import create_system_prompt
+
+    properties = catalogue[:results_per_query]
+    transformed = [transform_product_properties(props) for props in properties]
+    products = [Product(**result) for result in transformed]
+    # Collections ingested before product_summary existed go through the description/bullets path
+    products_without_summary = [product.model_copy(update={"summary": ""}) for product in products]
+    products_context = build_products_context("wireless headphones", products, "Sony", None)
+
+    # Built the way the SDK builds HTTP responses: lenient construction without validation
+    response = construct_type(type_=Response, value=response_payload({"input": "wireless headphones", "model": "gpt-4o"}))
+
+    def build_context(product_list):
+        return lambda: build_products_context("wireless headphones", product_list, "Sony", None)
+
+    return [
+        Benchmark("transform_product_properties", lambda: [transform_product_properties(props) for props in properties]),
+        Benchmark("product_construction", lambda: [Product(**result) for result in transformed]),
+        Benchmark("products_context_cold_summary", build_context(products), setup=snippet_cache.clear),
+        Benchmark("products_context_cold_full_text", build_context(products_without_summary), setup=snippet_cache.clear),
+        Benchmark("products_context_warm", build_context(products)),
+        Benchmark("create_system_prompt", lambda: create_system_prompt(products_context)),
+        Benchmark("extract_response_text", lambda: _extract_response_text(response)),
+    ]
+
+def compare(results: Dict, baseline_path: str) -> None:
+    """Print the median change of each benchmark relative to a previous results file"""
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["benchmarks"]
+
+    print(f"\n{'benchmark':<34}{'baseline us':>14}{'current us':>14}{'change':>10}")
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median_us"], stats["median_us"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<34}{before:>14.3f}{after:>14.3f}{change:>+9.1f}%")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark the backend's per-request CPU paths")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed calls before measuring")
+    parser.add_argument("--results-per-query", type=int, default=10, help="Products per simulated search result")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this string")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against a previous JSON results file")
+    args = parser.parse_args()
+
+    # The backend reads these at import time; no network calls are made
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    os.environ["WEAVIATE_URL"] = "http://fake-weaviate:8080"
+    os.environ.pop("WEAVIATE_API_KEY", None)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    catalogue = generate_catalogue(max(args.results_per_query, 100))
+    install_fake_weaviate(catalogue, LatencyModel(0))
+
+    benchmarks = build_benchmarks(catalogue, args.results_per_query)
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+
+    results = {}
+    print(f"{'benchmark':<34}{'calls':>10}{'min us':>12}{'median us':>12}{'stdev us':>12}")
+    for benchmark in benchmarks:
+        stats = benchmark.run(args.repeat, args.min_time, args.warmup)
+        results[benchmark.name] = stats
+        print(
+            f"{benchmark.name:<34}{stats['calls_per_repeat']:>10}{stats['min_us']:>12.3f}"
+            f"{stats['median_us']:>12.3f}{stats['stdev_us']:>12.3f}"
+        )
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "config": vars(args),
+                "benchmarks": results,
+            }, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Synthetic catalogue data shaped like the EcommerceProducts collection
+"""
+
+import random
+from typing import Dict, List
+
+BRANDS = [
+    "Apple", "Dell", "HP", "Lenovo", "ASUS", "Acer", "Samsung", "Microsoft", "Sony", "LG",
+    "Canon", "Nikon", "Nike", "Adidas", "Amazon", "Google", "Anker", "Bose", "Logitech", "JBL"
+]
+COLORS = ["Black", "White", "Gray", "Silver", "Blue", "Red", "Green", "Gold", "Pink", "Purple"]
+CATEGORIES = {
+    "laptop": ["16GB RAM", "512GB SSD", "14-inch display", "backlit keyboard", "all-day battery"],
+    "headphones": ["active noise cancelling", "40-hour battery", "Bluetooth 5.3", "foldable design"],
+    "running shoes": ["breathable mesh upper", "cushioned midsole", "rubber outsole", "lightweight"],
+    "phone case": ["shockproof bumper", "wireless charging compatible", "raised camera lip"],
+    "camera": ["24MP sensor", "4K video", "optical stabilization", "weather sealed body"],
+    "backpack": ["water resistant", "padded laptop sleeve", "USB charging port", "30L capacity"],
+}
+ADJECTIVES = ["Pro", "Ultra", "Lite", "Max", "Air", "Plus", "Mini", "Classic", "Sport", "Travel"]
+
+def generate_product(index: int, rng: random.Random) -> Dict:
+    """Generate one product's Weaviate properties"""
+    category, features = rng.choice(list(CATEGORIES.items()))
+    brand = rng.choice(BRANDS)
+    color = rng.choice(COLORS)
+    title = f"{brand} {rng.choice(ADJECTIVES)} {category.title()} {rng.randint(100, 999)}"
+    chosen_features = rng.sample(features, k=min(3, len(features)))
+    description = "<br>".join(
+        f"The {title} delivers {feature} for everyday use. Designed and tested by {brand} engineers."
+        for feature in chosen_features
+    ) * rng.randint(1, 4)
+    bullet_points = "\n".join(f"{feature.capitalize()} for {category} users" for feature in features)
+
+    return {
+        "product_id": f"B{index:09d}",
+        "product_title": title,
+        "product_brand": brand,
+        "product_color": color,
+        "product_description": description,
+        "product_bullet_point": bullet_points,
+        "product_summary": f"The {title} delivers {chosen_features[0]}; " + "; ".join(chosen_features[1:]),
+    }
+
+def generate_catalogue(size: int, seed: int = 42) -> List[Dict]:
+    """Generate a deterministic catalogue of product property dicts"""
+    rng = random.Random(seed)
+    return [generate_product(index, rng) for index in range(size)]
+
+def generate_queries(count: int, seed: int = 7) -> List[str]:
+    """Generate search queries with a skewed popularity distribution, like real traffic"""
+    rng = random.Random(seed)
+    vocabulary = [
+        f"{adjective.lower()} {category}" for category in CATEGORIES for adjective in ADJECTIVES
+    ] + [f"{color.lower()} {category}" for category in CATEGORIES for color in COLORS]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    return rng.choices(vocabulary, weights=weights, k=count)
@@ -0,0 +1,197 @@
+import time
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from config import config
+from shared_state import get_shared_db
+from metrics import cache_requests
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with per-entry TTL and LRU eviction
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 1000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                cache_requests.inc(cache=self.name, result="miss")
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                cache_requests.inc(cache=self.name, result="miss")
+                logger.debug("Cache '%s' entry expired: %s", self.name, key)
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            cache_requests.inc(cache=self.name, result="hit")
+            return value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entries when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                logger.debug("Cache '%s' evicted LRU entry: %s", self.name, evicted_key)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_expired(self) -> int:
+        """Drop all expired entries and return how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (expires_at, _) in self._entries.items() if expires_at < now]
+            for key in expired:
+                del self._entries[key]
+        return len(expired)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class SQLiteTTLCache:
+    """
+    TTL cache stored in the shared SQLite database so every worker process sees the
+    same entries. Values must be JSON serializable.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 1000, db_path: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.access_refresh_seconds = config.SHARED_STATE_ACCESS_REFRESH_SECONDS
+        self.trim_every_sets = max(config.CACHE_TRIM_EVERY_SETS, 1)
+        # Start due so the first write also trims whatever other processes left behind
+        self._sets_since_trim = self.trim_every_sets
+        self._db = get_shared_db(db_path or config.SHARED_STATE_PATH)
+
+        with self._db.lock:
+            self._db.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    cache_name TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (cache_name, cache_key)
+                )
+                """
+            )
+            self._db.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries (cache_name, last_access)"
+            )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        now = time.time()
+        with self._db.lock:
+            row = self._db.conn.execute(
+                "SELECT value, expires_at, last_access FROM cache_entries WHERE cache_name = ? AND cache_key = ?",
+                (self.name, key)
+            ).fetchone()
+
+            if row is None or row[1] < now:
+                self.misses += 1
+                cache_requests.inc(cache=self.name, result="miss")
+                return None
+
+            # LRU order only needs to be approximate, so most hits stay read-only
+            if now - row[2] >= self.access_refresh_seconds:
+                self._db.conn.execute(
+                    "UPDATE cache_entries SET last_access = ? WHERE cache_name = ? AND cache_key = ?",
+                    (now, self.name, key)
+                )
+
+        self.hits += 1
+        cache_requests.inc(cache=self.name, result="hit")
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store a value. Every trim_every_sets writes the least recently used entries beyond
+        max_entries are evicted, so the cache can briefly hold that many extra entries.
+        """
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        with self._db.lock:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (cache_name, cache_key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(value), now + ttl, now)
+            )
+            # Trimming sorts the whole cache by last_access, so it only runs periodically
+            self._sets_since_trim += 1
+            if self._sets_since_trim < self.trim_every_sets:
+                return
+            self._sets_since_trim = 0
+            self._db.conn.execute(
+                """
+                DELETE FROM cache_entries WHERE cache_name = ? AND cache_key IN (
+                    SELECT cache_key FROM cache_entries WHERE cache_name = ?
+                    ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.name, self.name, self.max_entries)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._db.lock:
+            self._db.conn.execute(
+                "DELETE FROM cache_entries WHERE cache_name = ? AND cache_key = ?", (self.name, key)
+            )
+
+    def purge_expired(self) -> int:
+        """Drop all expired entries and return how many were removed"""
+        with self._db.lock:
+            cursor = self._db.conn.execute(
+                "DELETE FROM cache_entries WHERE cache_name = ? AND expires_at < ?", (self.name, time.time())
+            )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        with self._db.lock:
+            self._db.conn.execute("DELETE FROM cache_entries WHERE cache_name = ?", (self.name,))
+
+    def __len__(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE cache_name = ?", (self.name,)
+            ).fetchone()[0]
+
+def create_cache(name: str, ttl_seconds: float, max_entries: int = 1000):
+    """Create a cache using the backend selected by CACHE_BACKEND"""
+    if config.CACHE_BACKEND.lower() == "sqlite":
+        logger.info("Cache '%s' uses the shared SQLite backend at %s", name, config.SHARED_STATE_PATH)
+        return SQLiteTTLCache(name, ttl_seconds, max_entries)
+    return TTLCache(name, ttl_seconds, max_entries)
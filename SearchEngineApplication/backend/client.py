@@ -1,10 +1,349 @@
+import re
+import time
+import heapq
+import random
+import asyncio
 import logging
-from typing import List, Dict, Optional
+import itertools
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, List, Dict, Optional
+import openai
 from openai import AsyncOpenAI
 from config import config
+from metrics import retries
+from tracing import span, traced, increment, current_request_id
 
 logger = logging.getLogger(__name__)
 
+class Priority(IntEnum):
+    """Scheduling priority for OpenAI calls; lower values are dispatched first"""
+    FOREGROUND = 0  # chat replies a user is waiting on
+    BACKGROUND = 1  # query rewrites, cache prewarming
+
+class SchedulerOverloadedError(RuntimeError):
+    """Raised when an OpenAI call cannot be queued or waited too long for capacity"""
+
+_DURATION_PART = re.compile(r"([\d.]+)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse rate-limit reset durations such as '20ms', '1s' or '6m0s' into seconds"""
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per minute, resynchronized from
+    OpenAI's x-ratelimit-* response headers whenever they are available
+    """
+
+    def __init__(self, capacity: float):
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.capacity / 60)
+        self._updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available (0 if they are available now)"""
+        self._refill()
+        # A single request larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+    def sync(self, limit: Optional[str], remaining: Optional[str], reset: Optional[str]) -> None:
+        """Adopt the server's view of the limit and remaining budget"""
+        try:
+            if limit:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self.tokens = float(remaining)
+                self._updated_at = time.monotonic()
+        except ValueError:
+            logger.debug("Ignoring malformed rate-limit headers: limit=%s, remaining=%s", limit, remaining)
+            return
+
+        reset_seconds = _parse_reset(reset)
+        if reset_seconds and self.tokens <= 0:
+            # Pin the refill so the bucket is empty until the server-reported reset
+            self.tokens = -reset_seconds * self.capacity / 60
+
+    def drain(self, seconds: float) -> None:
+        """Empty the bucket for at least the given number of seconds (e.g. after a 429)"""
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.capacity / 60)
+
+class OpenAIRequestScheduler:
+    """
+    Dispatches OpenAI calls under a concurrency cap and request/token budgets.
+
+    Waiting calls sit in a bounded priority queue, so foreground chat replies are
+    dispatched ahead of background work and, when the queue is full, displace
+    queued background calls instead of being rejected. Budgets follow the
+    x-ratelimit-* headers of each response, and 429s pause dispatch for the
+    server's retry-after before the call is retried.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue_size: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        queue_timeout: float,
+        max_retries: int
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.rejected = 0
+        self.rate_limited = 0
+        self._queue: List[list] = []  # heap of [priority, sequence, future, estimated_tokens]
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    def _wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        """Grant queued calls a slot in priority order as concurrency and budgets allow"""
+        while True:
+            while self._queue and self._queue[0][2].done():
+                heapq.heappop(self._queue)  # cancelled or timed out while waiting
+
+            if not self._queue or self.in_flight >= self.max_concurrency:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            _, _, future, estimated_tokens = self._queue[0]
+            delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(estimated_tokens))
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._queue)
+            self.request_bucket.consume(1)
+            self.token_bucket.consume(estimated_tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _try_grant(self, estimated_tokens: int) -> bool:
+        """Take a slot immediately if nothing is queued and capacity is available"""
+        if self._queue or self.in_flight >= self.max_concurrency:
+            return False
+        if self.request_bucket.wait_time(1) > 0 or self.token_bucket.wait_time(estimated_tokens) > 0:
+            return False
+        self.request_bucket.consume(1)
+        self.token_bucket.consume(estimated_tokens)
+        self.in_flight += 1
+        return True
+
+    async def _acquire(self, priority: Priority, estimated_tokens: int) -> None:
+        self._ensure_dispatcher()
+
+        if self._try_grant(estimated_tokens):
+            return
+
+        if len(self._queue) >= self.max_queue_size:
+            # Make room for foreground work by shedding the newest queued background call
+            background = [entry for entry in self._queue if entry[0] > priority and not entry[2].done()]
+            if not background:
+                self.rejected += 1
+                raise SchedulerOverloadedError("OpenAI request queue is full")
+            shed = max(background, key=lambda entry: (entry[0], entry[1]))
+            shed[2].set_exception(SchedulerOverloadedError("Shed from OpenAI queue for higher-priority work"))
+            self._queue.remove(shed)
+            heapq.heapify(self._queue)
+            self.rejected += 1
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, [priority, next(self._sequence), future, estimated_tokens])
+        self._wake()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                future.cancel()
+                self.rejected += 1
+                raise SchedulerOverloadedError(f"Waited more than {self.queue_timeout}s for OpenAI capacity")
+            if future.exception() is not None:
+                raise future.exception()
+        except asyncio.CancelledError:
+            # Caller went away; give back the slot if it had already been granted
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()
+            else:
+                future.cancel()
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _update_limits(self, headers: Any) -> None:
+        if headers is None:
+            return
+        self.request_bucket.sync(
+            headers.get("x-ratelimit-limit-requests"),
+            headers.get("x-ratelimit-remaining-requests"),
+            headers.get("x-ratelimit-reset-requests")
+        )
+        self.token_bucket.sync(
+            headers.get("x-ratelimit-limit-tokens"),
+            headers.get("x-ratelimit-remaining-tokens"),
+            headers.get("x-ratelimit-reset-tokens")
+        )
+
+    @staticmethod
+    def _retry_after(error: Exception, attempt: int) -> float:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except ValueError:
+            pass
+        return min(2 ** attempt + random.random(), 30)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        priority: Priority = Priority.FOREGROUND
+    ) -> Any:
+        """
+        Run call() (which must return a raw response) once capacity is available,
+        retrying rate-limited and transient failures, and return the parsed result
+        """
+        for attempt in range(self.max_retries + 1):
+            with span("openai_queue", priority=priority.name):
+                await self._acquire(priority, estimated_tokens)
+            try:
+                raw_response = await call()
+                self._update_limits(raw_response.headers)
+                return raw_response.parse()
+
+            except openai.RateLimitError as e:
+                self.rate_limited += 1
+                retry_after = self._retry_after(e, attempt)
+                self._update_limits(getattr(e.response, "headers", None))
+                self.request_bucket.drain(retry_after)
+                logger.warning("OpenAI rate limit hit (attempt %s), pausing dispatch for %.2fs", attempt + 1, retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                retries.inc(component="openai", reason="rate_limit")
+                increment("retries")
+
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                retry_after = self._retry_after(e, attempt)
+                logger.warning("Transient OpenAI error (attempt %s): %s; retrying in %.2fs", attempt + 1, e, retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                retries.inc(component="openai", reason="transient_error")
+                increment("retries")
+
+            finally:
+                self._release()
+
+            # Back off without holding a concurrency slot
+            await asyncio.sleep(retry_after)
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._queue),
+            "max_concurrency": self.max_concurrency,
+            "request_budget": round(self.request_bucket.tokens, 1),
+            "token_budget": round(self.token_bucket.tokens, 1),
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited
+        }
+
+def _estimate_tokens(text: str, max_output_tokens: int) -> int:
+    """Rough request size for the token budget: ~4 characters per input token plus the output cap"""
+    return len(text) // 4 + max_output_tokens
+
+def _request_headers() -> Dict[str, str]:
+    """Tag OpenAI calls with the current request ID so they can be matched in OpenAI's logs"""
+    request_id = current_request_id()
+    return {"X-Client-Request-Id": request_id} if request_id else {}
+
+def _extract_response_text(response) -> str:
+    """Extract the text content from a Responses API (or Chat Completions-like) result"""
+    content = ""
+    if hasattr(response, 'output') and response.output:
+        # Responses API typically returns output as a list of messages
+        if isinstance(response.output, list) and response.output:
+            # Extract text content from the first output message
+            first_output = response.output[0]
+            if hasattr(first_output, 'content'):
+                if isinstance(first_output.content, list) and first_output.content:
+                    # Content is a list of content blocks
+                    for content_block in first_output.content:
+                        if hasattr(content_block, 'text'):
+                            content += content_block.text
+                        elif hasattr(content_block, 'content'):
+                            content += str(content_block.content)
+                else:
+                    content = str(first_output.content)
+            else:
+                content = str(first_output)
+        else:
+            content = str(response.output)
+    elif hasattr(response, 'choices') and response.choices:
+        content = response.choices[0].message.content.strip()
+    elif hasattr(response, 'content'):
+        content = response.content.strip() if isinstance(response.content, str) else str(response.content)
+    else:
+        # Fallback: convert response to string and extract meaningful content
+        response_str = str(response)
+        # Try to extract text content from the string representation
+        if 'text=' in response_str:
+            text_match = re.search(r"text='([^']*)'", response_str)
+            if text_match:
+                content = text_match.group(1)
+            else:
+                content = response_str
+        else:
+            content = response_str
+    return content
+
 class OpenAIClientSingleton:
     _instance: Optional['OpenAIClientSingleton'] = None
     _client: Optional[AsyncOpenAI] = None
@@ -23,7 +362,16 @@ class OpenAIClientSingleton:
                 logger.error("OpenAI API key not found in environment variables")
                 raise ValueError("OpenAI API key not configured")
 
-            self._client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
+            # Retries are owned by the scheduler so they respect the shared rate-limit budget
+            self._client = AsyncOpenAI(api_key=config.OPENAI_API_KEY, max_retries=0)
+            self.scheduler = OpenAIRequestScheduler(
+                max_concurrency=config.OPENAI_MAX_CONCURRENCY,
+                max_queue_size=config.OPENAI_MAX_QUEUE_SIZE,
+                requests_per_minute=config.OPENAI_REQUESTS_PER_MINUTE,
+                tokens_per_minute=config.OPENAI_TOKENS_PER_MINUTE,
+                queue_timeout=config.OPENAI_QUEUE_TIMEOUT_SECONDS,
+                max_retries=config.OPENAI_MAX_RETRIES
+            )
             self._initialized = True
             logger.info("OpenAI async client initialized successfully")
 
@@ -34,125 +382,164 @@ class OpenAIClientSingleton:
             raise RuntimeError("OpenAI client not initialized")
         return self._client
 
+    @staticmethod
+    def _response_params(messages: List[Dict], previous_response_id: Optional[str], max_tokens: int) -> Dict:
+        """Build Responses API request parameters from chat-style messages"""
+        logger.debug("Messages: %s", [msg['role'] for msg in messages])
+
+        # Convert messages to the format expected by Responses API
+        # The last user message becomes the input
+        user_messages = [msg for msg in messages if msg['role'] == 'user']
+        system_messages = [msg for msg in messages if msg['role'] == 'system']
+
+        if not user_messages:
+            raise ValueError("No user messages found")
+
+        request_params = {
+            "model": "gpt-4o",  # Use gpt-4o as it's more commonly available for Responses API
+            "input": user_messages[-1]['content'],
+            "max_output_tokens": max_tokens,
+            "temperature": 0.7
+        }
+
+        # Use system message as instructions if available
+        if system_messages:
+            request_params["instructions"] = system_messages[0]['content']
+
+        if previous_response_id:
+            request_params["previous_response_id"] = previous_response_id
+            logger.debug("Including previous_response_id: %s", previous_response_id)
+
+        return request_params
+
+    @traced("openai_response")
     async def create_response(
         self,
         messages: List[Dict],
         previous_response_id: Optional[str] = None,
-        max_tokens: int = 800
+        max_tokens: int = 800,
+        priority: Priority = Priority.FOREGROUND
     ) -> Dict:
         """
         Create a response using OpenAI Responses API
         """
         try:
-            logger.info(f"Creating OpenAI response with {len(messages)} messages")
-            logger.debug(f"Messages: {[msg['role'] for msg in messages]}")
+            logger.info("Creating OpenAI response with %s messages", len(messages))
+            request_params = self._response_params(messages, previous_response_id, max_tokens)
 
-            # Convert messages to the format expected by Responses API
-            # The last user message becomes the input
-            user_messages = [msg for msg in messages if msg['role'] == 'user']
-            system_messages = [msg for msg in messages if msg['role'] == 'system']
+            response = await self.scheduler.run(
+                lambda: self.client.responses.with_raw_response.create(**request_params, extra_headers=_request_headers()),
+                estimated_tokens=_estimate_tokens(request_params["input"] + request_params.get("instructions", ""), max_tokens),
+                priority=priority
+            )
 
-            if not user_messages:
-                raise ValueError("No user messages found")
+            logger.info("OpenAI response created successfully with ID: %s", response.id)
 
-            # Use the last user message as input
-            input_text = user_messages[-1]['content']
+            content = _extract_response_text(response)
 
-            # Use system message as instructions if available
-            instructions = system_messages[0]['content'] if system_messages else None
+            logger.debug("Response content length: %s", len(content))
 
-            request_params = {
-                "model": "gpt-4o",  # Use gpt-4o as it's more commonly available for Responses API
-                "input": input_text,
-                "max_output_tokens": max_tokens,
-                "temperature": 0.7
+            return {
+                "content": content,
+                "response_id": response.id,
+                "model": getattr(response, 'model', 'gpt-4o'),
+                "usage": getattr(response, 'usage', None)
             }
 
-            if instructions:
-                request_params["instructions"] = instructions
-
-            if previous_response_id:
-                request_params["previous_response_id"] = previous_response_id
-                logger.debug(f"Including previous_response_id: {previous_response_id}")
-
-            response = await self.client.responses.create(**request_params)
-
-            logger.info(f"OpenAI response created successfully with ID: {response.id}")
-
-            # Extract content from the response
-            content = ""
-            if hasattr(response, 'output') and response.output:
-                # Responses API typically returns output as a list of messages
-                if isinstance(response.output, list) and response.output:
-                    # Extract text content from the first output message
-                    first_output = response.output[0]
-                    if hasattr(first_output, 'content'):
-                        if isinstance(first_output.content, list) and first_output.content:
-                            # Content is a list of content blocks
-                            for content_block in first_output.content:
-                                if hasattr(content_block, 'text'):
-                                    content += content_block.text
-                                elif hasattr(content_block, 'content'):
-                                    content += str(content_block.content)
-                        else:
-                            content = str(first_output.content)
-                    else:
-                        content = str(first_output)
-                else:
-                    content = str(response.output)
-            elif hasattr(response, 'choices') and response.choices:
-                content = response.choices[0].message.content.strip()
-            elif hasattr(response, 'content'):
-                content = response.content.strip() if isinstance(response.content, str) else str(response.content)
-            else:
-                # Fallback: convert response to string and extract meaningful content
-                response_str = str(response)
-                # Try to extract text content from the string representation
-                if 'text=' in response_str:
-                    import re
-                    text_match = re.search(r"text='([^']*)'", response_str)
-                    if text_match:
-                        content = text_match.group(1)
-                    else:
-                        content = response_str
-                else:
-                    content = response_str
+        except Exception as e:
+            logger.error("Error creating OpenAI response: %s", e)
+            raise
 
-            logger.debug(f"Response content length: {len(content)}")
+    @traced("openai_response")
+    async def stream_response(
+        self,
+        messages: List[Dict],
+        on_delta: Callable[[str], Awaitable[None]],
+        previous_response_id: Optional[str] = None,
+        max_tokens: int = 800,
+        priority: Priority = Priority.FOREGROUND
+    ) -> Dict:
+        """
+        Create a response using the OpenAI Responses API, passing each text delta to
+        on_delta as it arrives. Returns the same dict as create_response.
+        """
+        try:
+            logger.info("Streaming OpenAI response with %s messages", len(messages))
+            request_params = self._response_params(messages, previous_response_id, max_tokens)
+            chunks: List[str] = []
+            completed: Dict[str, Any] = {}
+
+            async def call():
+                raw_response = await self.client.responses.with_raw_response.create(
+                    **request_params, stream=True, extra_headers=_request_headers()
+                )
+                try:
+                    async for event in raw_response.parse():
+                        if event.type == "response.output_text.delta":
+                            chunks.append(event.delta)
+                            await on_delta(event.delta)
+                        elif event.type == "response.completed":
+                            completed["response"] = event.response
+                except (openai.APIConnectionError, openai.InternalServerError) as e:
+                    # Retrying would replay text the caller has already forwarded
+                    if chunks:
+                        raise RuntimeError(f"OpenAI response stream interrupted: {e}") from e
+                    raise
+                return raw_response
+
+            # The whole stream is consumed inside the scheduled call, so the concurrency
+            # slot is held until the last token has been forwarded
+            await self.scheduler.run(
+                call,
+                estimated_tokens=_estimate_tokens(request_params["input"] + request_params.get("instructions", ""), max_tokens),
+                priority=priority
+            )
+
+            response = completed.get("response")
+            content = "".join(chunks)
+            logger.info("OpenAI response streamed with ID: %s", getattr(response, "id", None))
+            logger.debug("Response content length: %s", len(content))
 
             return {
                 "content": content,
-                "response_id": response.id,
-                "model": getattr(response, 'model', 'gpt-4o'),
-                "usage": getattr(response, 'usage', None)
+                "response_id": getattr(response, "id", None),
+                "model": getattr(response, "model", "gpt-4o"),
+                "usage": getattr(response, "usage", None)
             }
 
         except Exception as e:
-            logger.error(f"Error creating OpenAI response: {str(e)}")
+            logger.error("Error streaming OpenAI response: %s", e)
             raise
 
+    @traced("openai_completion")
     async def create_completion(
         self,
         messages: List[Dict],
         max_tokens: int = 50,
         temperature: float = 0.3,
-        model: str = "gpt-4o"
+        model: str = "gpt-4o",
+        priority: Priority = Priority.FOREGROUND
     ) -> Dict:
         """
         Create a simple completion using the standard Chat Completions API
         """
         try:
-            logger.debug(f"Creating completion with {len(messages)} messages")
+            logger.debug("Creating completion with %s messages", len(messages))
 
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature
+            response = await self.scheduler.run(
+                lambda: self.client.chat.completions.with_raw_response.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    extra_headers=_request_headers()
+                ),
+                estimated_tokens=_estimate_tokens("".join(msg["content"] for msg in messages), max_tokens),
+                priority=priority
             )
 
             content = response.choices[0].message.content.strip()
-            logger.debug(f"Completion content: '{content}'")
+            logger.debug("Completion content: '%s'", content)
 
             return {
                 "content": content,
@@ -161,7 +548,7 @@ class OpenAIClientSingleton:
             }
 
         except Exception as e:
-            logger.error(f"Error creating completion: {str(e)}")
+            logger.error("Error creating completion: %s", e)
             raise
 
     async def list_conversation_responses(
@@ -173,7 +560,7 @@ class OpenAIClientSingleton:
         List conversation items using the input_items API
         """
         try:
-            logger.info(f"Listing conversation items for conversation_id: {conversation_id}")
+            logger.info("Listing conversation items for conversation_id: %s", conversation_id)
 
             # Use input_items.list() to get conversation history
             params = {"limit": limit}
@@ -182,11 +569,11 @@ class OpenAIClientSingleton:
 
             responses = await self.client.responses.input_items.list(**params)
 
-            logger.info(f"Retrieved conversation items")
+            logger.info("Retrieved conversation items")
             return [item.model_dump() for item in responses.data] if hasattr(responses, 'data') else []
 
         except Exception as e:
-            logger.error(f"Error listing conversation items: {str(e)}")
+            logger.error("Error listing conversation items: %s", e)
             raise
 
 openai_client = OpenAIClientSingleton()
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 from typing import List
 from dotenv import load_dotenv
 import logging
+from logging_config import setup_logging, parse_sampling_rates
 
 load_dotenv()
 
@@ -10,6 +11,10 @@ class Config:
     WEAVIATE_URL: str = os.getenv("WEAVIATE_URL")
     WEAVIATE_API_KEY: str = os.getenv("WEAVIATE_API_KEY")
 
+    # Startup connects to Weaviate and warms it up before /readyz reports ready, retrying with
+    # backoff starting from this delay while Weaviate is unreachable
+    WEAVIATE_STARTUP_RETRY_SECONDS: float = float(os.getenv("WEAVIATE_STARTUP_RETRY_SECONDS", "2"))
+
     API_HOST: str = os.getenv("API_HOST", "0.0.0.0")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
@@ -21,16 +26,106 @@ class Config:
     ]
 
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    # Logging runs through a queue to a background thread. LOG_FORMAT is "text" or "json";
+    # LOG_SAMPLING keeps a fraction of INFO/DEBUG lines per logger, e.g. "routes=0.1,helpers=0.25"
+    LOG_FILE: str = os.getenv("LOG_FILE", "backend.log")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+
+    # OpenAI call scheduling. Request/token budgets are starting values that are replaced by
+    # the x-ratelimit-* headers OpenAI returns; they apply per worker process.
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+    OPENAI_MAX_QUEUE_SIZE: int = int(os.getenv("OPENAI_MAX_QUEUE_SIZE", "100"))
+    OPENAI_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("OPENAI_QUEUE_TIMEOUT_SECONDS", "30"))
+    OPENAI_REQUESTS_PER_MINUTE: int = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500"))
+    OPENAI_TOKENS_PER_MINUTE: int = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "30000"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+    # Multi-worker serving: with more than one worker, sessions and caches default to a
+    # SQLite WAL database on local disk that every worker process shares
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    SHARED_STATE_PATH: str = os.getenv("SHARED_STATE_PATH", "shared_state.db")
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "sqlite" if WORKERS > 1 else "memory")
+    # Reads only rewrite the last_access of a SQLite cache entry or session once it is this
+    # stale, and SQLite caches are trimmed to their max entries once every this many writes
+    # per worker, so hits and writes do not all queue on the database write lock
+    SHARED_STATE_ACCESS_REFRESH_SECONDS: float = float(os.getenv("SHARED_STATE_ACCESS_REFRESH_SECONDS", "30"))
+    CACHE_TRIM_EVERY_SETS: int = int(os.getenv("CACHE_TRIM_EVERY_SETS", "100"))
+
+    # Initial chat summaries are shared across sessions with the same query, filters and products
+    SUMMARY_CACHE_TTL_SECONDS: int = int(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "600"))
+    SUMMARY_CACHE_MAX_ENTRIES: int = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1000"))
+
+    # Read the compact product_summary written at ingestion (Data_Ingestion/enrichment.py)
+    # instead of fetching full descriptions and bullet points on every search
+    USE_PRODUCT_SUMMARY: bool = os.getenv("USE_PRODUCT_SUMMARY", "True").lower() == "true"
+
+    # Products context for the LLM is built within a token budget from cached per-product snippets
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+    SNIPPET_CACHE_TTL_SECONDS: int = int(os.getenv("SNIPPET_CACHE_TTL_SECONDS", "3600"))
+    SNIPPET_CACHE_MAX_ENTRIES: int = int(os.getenv("SNIPPET_CACHE_MAX_ENTRIES", "20000"))
+
+    # Semantic search results cache
+    SEARCH_CACHE_TTL_SECONDS: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+    SEARCH_CACHE_MAX_ENTRIES: int = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+
+    # Per-session candidate pools: each session's current query is over-fetched to this many
+    # products so brand/color refinements can be filtered in memory instead of requerying Weaviate
+    CANDIDATE_POOL_SIZE: int = int(os.getenv("CANDIDATE_POOL_SIZE", "100"))
+    CANDIDATE_POOL_TTL_SECONDS: int = int(os.getenv("CANDIDATE_POOL_TTL_SECONDS", "3600"))
+    CANDIDATE_POOL_MAX_ENTRIES: int = int(os.getenv("CANDIDATE_POOL_MAX_ENTRIES", "2000"))
+
+    # Startup cache prewarming from PREWARM_QUERIES_FILE (one query per line) or, when that is
+    # not set, from the most frequent queries in the query log the backend writes itself
+    PREWARM_ENABLED: bool = os.getenv("PREWARM_ENABLED", "True").lower() == "true"
+    PREWARM_QUERIES_FILE: str = os.getenv("PREWARM_QUERIES_FILE", "")
+    PREWARM_TOP_QUERIES: int = int(os.getenv("PREWARM_TOP_QUERIES", "50"))
+    PREWARM_CONCURRENCY: int = int(os.getenv("PREWARM_CONCURRENCY", "4"))
+    QUERY_LOG_PATH: str = os.getenv("QUERY_LOG_PATH", "query_log.txt")
+    # Once the query log grows past this size, startup folds it into per-query counts for
+    # the most frequent QUERY_LOG_MAX_DISTINCT queries
+    QUERY_LOG_MAX_BYTES: int = int(os.getenv("QUERY_LOG_MAX_BYTES", str(1024 * 1024)))
+    QUERY_LOG_MAX_DISTINCT: int = int(os.getenv("QUERY_LOG_MAX_DISTINCT", "5000"))
+
+    # Chat session storage: "memory" (LRU/TTL, process-local) or "sqlite"
+    SESSION_STORE_BACKEND: str = os.getenv("SESSION_STORE_BACKEND", "sqlite" if WORKERS > 1 else "memory")
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", SHARED_STATE_PATH)
+    SESSION_TTL_SECONDS: int = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    SESSION_MAX_COUNT: int = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+    SESSION_MAX_MEMORY_MB: int = int(os.getenv("SESSION_MAX_MEMORY_MB", "256"))
+    # The SQLite store enforces the TTL and SESSION_MAX_COUNT once every this many writes
+    # per worker rather than counting the table on each one
+    SESSION_EVICT_EVERY_PUTS: int = int(os.getenv("SESSION_EVICT_EVERY_PUTS", "100"))
+    # The in-memory store is snapshotted to SESSION_SNAPSHOT_PATH periodically and on shutdown,
+    # and restored on startup; empty disables snapshots, an interval of 0 only snapshots on shutdown
+    SESSION_SNAPSHOT_PATH: str = os.getenv("SESSION_SNAPSHOT_PATH", "session_snapshot.bin")
+    SESSION_SNAPSHOT_INTERVAL_SECONDS: int = int(os.getenv("SESSION_SNAPSHOT_INTERVAL_SECONDS", "300"))
+
+    # Per-request tracing: Server-Timing response headers and optional JSONL trace export
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "True").lower() == "true"
+    TRACE_EXPORT_PATH: str = os.getenv("TRACE_EXPORT_PATH", "")
+
+    # Admin profiling endpoints (/admin/profile/*) are only mounted when enabled and an
+    # ADMIN_TOKEN is set; requests must send it in the X-Admin-Token header
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    PROFILING_MAX_SECONDS: int = int(os.getenv("PROFILING_MAX_SECONDS", "60"))
+
+    # Search and chat requests slower than the threshold are appended to a JSONL log, rotated by
+    # size with a single worker and left to external rotation with several. With tracing
+    # disabled entries only hold the endpoint, status and total duration
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "3000"))
+    SLOW_QUERY_LOG_PATH: str = os.getenv("SLOW_QUERY_LOG_PATH", "slow_queries.jsonl")
+    SLOW_QUERY_LOG_MAX_BYTES: int = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    SLOW_QUERY_LOG_BACKUPS: int = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
 
 config = Config()
 
-logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL.upper()),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('backend.log')
-    ]
+setup_logging(
+    level=config.LOG_LEVEL,
+    log_file=config.LOG_FILE,
+    json_format=config.LOG_FORMAT.lower() == "json",
+    sampling=parse_sampling_rates(config.LOG_SAMPLING)
 )
 
 logger = logging.getLogger(__name__)
\ No newline at end of file
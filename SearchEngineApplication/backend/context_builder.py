@@ -0,0 +1,163 @@
+import re
+import logging
+from typing import List, Optional, Tuple
+from models import Product
+from cache import TTLCache
+from config import config
+from metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o tokenizer
+    logger.info("Using tiktoken for products context token budgeting")
+except Exception as e:
+    # tiktoken missing or its BPE file unavailable: fall back to a character estimate
+    _encoding = None
+    logger.info("tiktoken unavailable (%s), estimating tokens from character count", e)
+
+# Rendered snippet segments only depend on the product, so they are cached by product ID
+snippet_cache = TTLCache(
+    "product_snippets",
+    ttl_seconds=config.SNIPPET_CACHE_TTL_SECONDS,
+    max_entries=config.SNIPPET_CACHE_MAX_ENTRIES
+)
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_BULLET_SPLIT = re.compile(r"\n|•|\|")
+_SUMMARY_SPLIT = re.compile(r";\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model tokenizer, or estimate ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def _clean(text: str) -> str:
+    text = re.sub(r"<br\s*/?>", "\n", text, flags=re.IGNORECASE)
+    return _HTML_TAG.sub(" ", text)
+
+def _informative_segments(text: str, splitter: re.Pattern, seen_words: set) -> List[Tuple[float, str]]:
+    """Split text into segments scored by how many new words they add per character"""
+    scored = []
+    for segment in splitter.split(_clean(text)):
+        segment = " ".join(segment.split()).strip(" -;,")
+        words = set(_WORD.findall(segment.lower()))
+        new_words = words - seen_words
+        if len(words) < 3 or not new_words:
+            continue
+        seen_words |= words
+        scored.append((len(new_words) / len(segment), segment))
+    return scored
+
+def _product_segments(product: Product) -> Tuple[Tuple[str, int], List[Tuple[str, str, int]]]:
+    """
+    Return the product header and its candidate (field, text, tokens) segments,
+    most informative first. Results are cached by product ID.
+    """
+    cached = snippet_cache.get(product.id) if product.id else None
+    if cached is not None:
+        return cached
+
+    header = f"- {product.title} by {product.brand}" + (f" (Color: {product.color})" if product.color else "")
+    seen_words = set(_WORD.findall(header.lower()))
+
+    if product.summary:
+        # The ingestion-time summary is already cleaned and compact, so it is used on its own
+        candidates = [
+            ("Summary", score, text)
+            for score, text in _informative_segments(product.summary, _SUMMARY_SPLIT, seen_words)
+        ]
+    else:
+        # Feature bullets are usually denser than marketing copy, so they rank first on ties
+        candidates = [
+            ("Key Features", score * 1.2, text)
+            for score, text in _informative_segments(product.bullet_points or "", _BULLET_SPLIT, seen_words)
+        ] + [
+            ("Description", score, text)
+            for score, text in _informative_segments(product.description or "", _SENTENCE_SPLIT, seen_words)
+        ]
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+
+    segments = (
+        (header, count_tokens(header)),
+        [(field, text, count_tokens(text) + 1) for field, _, text in candidates]
+    )
+    if product.id:
+        snippet_cache.set(product.id, segments)
+    return segments
+
+def render_product_snippet(product: Product, token_budget: int) -> Tuple[str, int]:
+    """Render one product within token_budget and return the snippet with its token count"""
+    (header, used), segments = _product_segments(product)
+
+    selected = {"Summary": [], "Description": [], "Key Features": []}
+    for field, text, tokens in segments:
+        label_tokens = 0 if selected[field] else 4
+        if used + tokens + label_tokens > token_budget:
+            continue
+        selected[field].append(text)
+        used += tokens + label_tokens
+
+    snippet = header
+    if selected["Summary"]:
+        snippet += "\n  Summary: " + "; ".join(selected["Summary"])
+    if selected["Description"]:
+        snippet += "\n  Description: " + " ".join(selected["Description"])
+    if selected["Key Features"]:
+        snippet += "\n  Key Features: " + "; ".join(selected["Key Features"])
+    return snippet, used
+
+def build_products_context(
+    query: str,
+    products: List[Product],
+    brand_filter: Optional[str] = None,
+    color_filter: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_products: int = 5
+) -> str:
+    """
+    Build the products context for the system prompt within an explicit token budget
+    """
+    if not products:
+        return ""
+
+    with time_stage("context_build"):
+        return _build_products_context(query, products, brand_filter, color_filter, token_budget, max_products)
+
+def _build_products_context(
+    query: str,
+    products: List[Product],
+    brand_filter: Optional[str],
+    color_filter: Optional[str],
+    token_budget: Optional[int],
+    max_products: int
+) -> str:
+    budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+
+    filter_info = ""
+    if brand_filter or color_filter:
+        filter_parts = []
+        if brand_filter:
+            filter_parts.append(f"Brand: {brand_filter}")
+        if color_filter:
+            filter_parts.append(f"Color: {color_filter}")
+        filter_info = f" (FILTERED BY: {', '.join(filter_parts)})"
+
+    heading = f"SEARCH RESULTS FOR: '{query}'{filter_info}\n\n"
+    remaining = budget - count_tokens(heading)
+
+    # Split the budget evenly; whatever a short product leaves unused rolls over to the next one
+    context_products = products[:max_products]
+    snippets = []
+    for index, product in enumerate(context_products):
+        share = remaining // (len(context_products) - index)
+        snippet, used = render_product_snippet(product, share)
+        snippets.append(snippet)
+        remaining -= used
+
+    logger.debug("Products context built with %s/%s tokens for %s products", budget - remaining, budget, len(snippets))
+    return heading + "\n".join(snippets)
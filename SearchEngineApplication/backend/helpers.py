@@ -1,16 +1,168 @@
 import uuid
+import hashlib
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from models import ChatMessage, ChatSession, Product
-from client import openai_client
+from client import openai_client, Priority
+from cache import create_cache
+from session_store import SessionStore
+from context_builder import build_products_context
+from config import config
+from metrics import time_stage, fallbacks, cache_requests
+from tracing import span, traced, annotate
 
 logger = logging.getLogger(__name__)
 
+summary_cache = create_cache(
+    "chat_summary",
+    ttl_seconds=config.SUMMARY_CACHE_TTL_SECONDS,
+    max_entries=config.SUMMARY_CACHE_MAX_ENTRIES
+)
+
+search_cache = create_cache(
+    "search_results",
+    ttl_seconds=config.SEARCH_CACHE_TTL_SECONDS,
+    max_entries=config.SEARCH_CACHE_MAX_ENTRIES
+)
+
+candidate_pools = create_cache(
+    "candidate_pools",
+    ttl_seconds=config.CANDIDATE_POOL_TTL_SECONDS,
+    max_entries=config.CANDIDATE_POOL_MAX_ENTRIES
+)
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse whitespace for use in cache keys"""
+    return " ".join(query.lower().split())
+
+def cached_semantic_search(
+    query: str,
+    limit: int = 10,
+    brand_filter: Optional[str] = None,
+    color_filter: Optional[str] = None
+) -> List[Dict]:
+    """
+    Perform a Weaviate semantic search through the search results cache
+    """
+    cache_key = f"{normalize_query(query)}|{limit}|{(brand_filter or '').strip().lower()}|{(color_filter or '').strip().lower()}"
+
+    with span("search", cached=False) as search_span:
+        results = search_cache.get(cache_key)
+        if results is not None:
+            logger.info("Serving cached search results for query: '%s' (%s products)", query, len(results))
+            if search_span:
+                search_span.attributes["cached"] = True
+            annotate(search_cached=True)
+            return results
+
+        from weaviate_client import weaviate_client
+
+        results = weaviate_client.semantic_search(
+            query=query,
+            limit=limit,
+            brand_filter=brand_filter,
+            color_filter=color_filter
+        )
+        search_cache.set(cache_key, results)
+        annotate(search_cached=False)
+        return results
+
+def _normalize_filter(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+def store_candidate_pool(
+    session_id: str,
+    query: str,
+    brand_filter: Optional[str],
+    color_filter: Optional[str],
+    products: List[Dict]
+) -> None:
+    """Keep the over-fetched results of a session's current query as its candidate pool"""
+    candidate_pools.set(session_id, {
+        "query": query,
+        "brand_filter": brand_filter,
+        "color_filter": color_filter,
+        "products": products
+    })
+
+def fetch_candidate_pool(
+    session_id: str,
+    query: str,
+    brand_filter: Optional[str] = None,
+    color_filter: Optional[str] = None
+) -> List[Dict]:
+    """
+    Over-fetch CANDIDATE_POOL_SIZE results for a session's current query and keep them as
+    the session's candidate pool. Returns the whole pool, best match first.
+    """
+    results = cached_semantic_search(
+        query=query,
+        limit=config.CANDIDATE_POOL_SIZE,
+        brand_filter=brand_filter,
+        color_filter=color_filter
+    )
+    store_candidate_pool(session_id, query, brand_filter, color_filter, results)
+    return results
+
+def _pool_covers(pool: Dict, brand_filter: Optional[str], color_filter: Optional[str]) -> bool:
+    # A pool fetched with a filter only holds products matching it, so it can answer
+    # requests that keep that filter but not requests that drop or change it
+    for pool_filter, requested in ((pool["brand_filter"], brand_filter), (pool["color_filter"], color_filter)):
+        if pool_filter and _normalize_filter(pool_filter) != _normalize_filter(requested):
+            return False
+    return True
+
+def refine_session_products(
+    session: ChatSession,
+    brand_filter: Optional[str] = None,
+    color_filter: Optional[str] = None,
+    limit: int = 10
+) -> List[Dict]:
+    """
+    Narrow a session's results to new brand/color filters. Served by filtering the session's
+    candidate pool in memory; Weaviate is only queried when the pool is missing, was fetched
+    with filters the request drops, or holds fewer than `limit` matches without being exhaustive.
+    """
+    with span("refine", served_from_pool=False) as refine_span:
+        pool = candidate_pools.get(session.session_id)
+        if pool is None:
+            if not session.search_query:
+                raise ValueError(f"Session {session.session_id} has no search to refine")
+            pool = {"query": session.search_query, "brand_filter": None, "color_filter": None, "products": None}
+
+        if pool["products"] is not None and _pool_covers(pool, brand_filter, color_filter):
+            brand, color = _normalize_filter(brand_filter), _normalize_filter(color_filter)
+            # Facet values come from the collection itself, so exact (case-insensitive)
+            # equality selects the same products as Weaviate's equal filter
+            matches = [
+                product for product in pool["products"]
+                if (not brand or _normalize_filter(product.get("brand")) == brand)
+                and (not color or _normalize_filter(product.get("color")) == color)
+            ]
+            # A pool shorter than CANDIDATE_POOL_SIZE already holds every match for its query
+            if len(matches) >= limit or len(pool["products"]) < config.CANDIDATE_POOL_SIZE:
+                cache_requests.inc(cache="candidate_pool_refine", result="hit")
+                if refine_span:
+                    refine_span.attributes["served_from_pool"] = True
+                annotate(refine_served_from_pool=True, result_count=min(len(matches), limit))
+                logger.info("Refined session %s from its candidate pool: %s of %s products match", session.session_id, len(matches), len(pool["products"]))
+                return matches[:limit]
+
+            results = cached_semantic_search(pool["query"], limit, brand_filter, color_filter)
+        else:
+            # The pool cannot answer this request, so it is replaced by one for the new filters
+            results = fetch_candidate_pool(session.session_id, pool["query"], brand_filter, color_filter)[:limit]
+
+        cache_requests.inc(cache="candidate_pool_refine", result="miss")
+        annotate(refine_served_from_pool=False, result_count=len(results))
+        logger.info("Refined session %s with a Weaviate search: %s products", session.session_id, len(results))
+        return results
+
 def generate_session_id() -> str:
     """Generate a unique session ID"""
     session_id = str(uuid.uuid4())
-    logger.debug(f"Generated new session ID: {session_id}")
+    logger.debug("Generated new session ID: %s", session_id)
     return session_id
 
 async def generate_search_query_from_history(messages: List[Dict], new_message: str) -> str:
@@ -45,11 +197,13 @@ Generate a search query that captures the user's current intent. The query shoul
 Return only the search query, nothing else."""
 
         # Make OpenAI call to generate the search query using completions API
-        response_data = await openai_client.create_completion(
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=20,
-            temperature=0.3
-        )
+        with time_stage("llm_rewrite"):
+            response_data = await openai_client.create_completion(
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=20,
+                temperature=0.3,
+                priority=Priority.BACKGROUND
+            )
 
         generated_query = response_data.get("content", "").strip().strip('"').strip("'")
 
@@ -58,19 +212,21 @@ Return only the search query, nothing else."""
             fallback_query = new_message
             if "(with filters:" in fallback_query:
                 fallback_query = fallback_query.split("(with filters:")[0].strip()
-            logger.warning(f"Empty OpenAI response, using fallback: '{fallback_query}'")
+            logger.warning("Empty OpenAI response, using fallback: '%s'", fallback_query)
+            fallbacks.inc(kind="query_rewrite")
             return fallback_query
 
-        logger.info(f"Generated search query from conversation: '{generated_query}'")
+        logger.info("Generated search query from conversation: '%s'", generated_query)
         return generated_query
 
     except Exception as e:
-        logger.error(f"Error generating search query from history: {str(e)}")
+        logger.error("Error generating search query from history: %s", e)
         # Fallback to just the new message (cleaned)
         fallback_query = new_message
         if "(with filters:" in fallback_query:
             fallback_query = fallback_query.split("(with filters:")[0].strip()
-        logger.info(f"Using fallback search query: '{fallback_query}'")
+        logger.info("Using fallback search query: '%s'", fallback_query)
+        fallbacks.inc(kind="query_rewrite")
         return fallback_query
 
 def create_system_prompt(products_context: str = None) -> str:
@@ -86,7 +242,7 @@ def create_system_prompt(products_context: str = None) -> str:
 IMPORTANT: When a user searches for something, I will provide you with the ACTUAL PRODUCTS that were found in our database. Always reference these specific products in your responses."""
 
     if products_context:
-        logger.info(f"Creating system prompt with products_context: {products_context[:500]}...")
+        logger.debug("Creating system prompt with products_context: %s...", products_context[:500])
         return f"""{base_prompt}
 
 🔍 CURRENT SEARCH RESULTS:
@@ -106,22 +262,72 @@ CRITICAL: These are REAL products that exist in our database and are currently d
 
     return base_prompt
 
-async def process_chat_start(query: str, user_id: str = None, products_context: str = None) -> Dict:
+def build_summary_cache_key(
+    query: str,
+    brand_filter: Optional[str],
+    color_filter: Optional[str],
+    product_ids: List[str]
+) -> str:
+    """
+    Build the summary cache key from the normalized query, filters and a fingerprint
+    of the product IDs that make up the products context
     """
-    Process the initial chat start request
+    normalized_query = normalize_query(query)
+    normalized_brand = (brand_filter or "").strip().lower()
+    normalized_color = (color_filter or "").strip().lower()
+    products_fingerprint = hashlib.sha1("|".join(product_ids).encode("utf-8")).hexdigest()
+    return f"{normalized_query}|{normalized_brand}|{normalized_color}|{products_fingerprint}"
+
+async def generate_initial_summary(
+    query: str,
+    products_context: str = None,
+    summary_cache_key: Optional[str] = None,
+    priority: Priority = Priority.FOREGROUND
+) -> Tuple[Dict, bool]:
+    """
+    Generate the initial assistant summary for a search, reusing a cached one when
+    available. Returns the response data and whether it came from the cache.
+    """
+    response_data = summary_cache.get(summary_cache_key) if summary_cache_key else None
+    if response_data is not None:
+        logger.info("Serving cached chat summary for query: '%s' (response ID: %s)", query, response_data['response_id'])
+        return response_data, True
+
+    system_prompt = create_system_prompt(products_context)
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"I want to search for: {query}"}
+    ]
+
+    with time_stage("llm_response"):
+        response_data = await openai_client.create_response(messages, priority=priority)
+
+    # Only cache usable summaries; the stored response ID stays valid for chaining
+    if summary_cache_key and response_data.get("content") and response_data.get("response_id"):
+        summary_cache.set(summary_cache_key, {
+            "content": response_data["content"],
+            "response_id": response_data["response_id"]
+        })
+
+    return response_data, False
+
+@traced("chat_start")
+async def process_chat_start(
+    query: str,
+    user_id: str = None,
+    products_context: str = None,
+    summary_cache_key: Optional[str] = None
+) -> Dict:
+    """
+    Process the initial chat start request, reusing a cached summary when one exists
     """
     try:
-        logger.info(f"Processing chat start for query: '{query}' (user: {user_id})")
+        logger.info("Processing chat start for query: '%s' (user: %s)", query, user_id)
 
         session_id = generate_session_id()
-        system_prompt = create_system_prompt(products_context)
-
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"I want to search for: {query}"}
-        ]
 
-        response_data = await openai_client.create_response(messages)
+        response_data, summary_cached = await generate_initial_summary(query, products_context, summary_cache_key)
 
         initial_message = ChatMessage(
             role="assistant",
@@ -144,72 +350,69 @@ async def process_chat_start(query: str, user_id: str = None, products_context:
             last_updated=datetime.now()
         )
 
-        logger.info(f"Chat session created successfully: {session_id}")
-        logger.debug(f"Initial response length: {len(response_data['content'])}")
+        logger.info("Chat session created successfully: %s", session_id)
+        logger.debug("Initial response length: %s", len(response_data['content']))
 
         return {
             "session": chat_session,
             "response_id": response_data["response_id"],
-            "usage": response_data.get("usage")
+            "usage": response_data.get("usage"),
+            "summary_cached": summary_cached
         }
 
     except Exception as e:
-        logger.error(f"Error processing chat start: {str(e)}")
+        logger.error("Error processing chat start: %s", e)
         raise
 
+@traced("chat_message")
 async def process_chat_message(
     session: ChatSession,
     message: str,
     user_id: str = None,
     brand_filter: str = None,
-    color_filter: str = None
+    color_filter: str = None,
+    on_products: Optional[Callable[[str, List[Product]], Awaitable[None]]] = None,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None
 ) -> Dict:
     """
-    Process a new message in an existing chat session with search on every message
+    Process a new message in an existing chat session with search on every message.
+    Streaming callers pass on_products, called with the search query and results as soon
+    as the search finishes, and on_token, which receives the assistant reply as it streams.
     """
     try:
-        logger.info(f"Processing message in session {session.session_id}: '{message}' with filters - Brand: {brand_filter}, Color: {color_filter}")
+        logger.info("Processing message in session %s: '%s' with filters - Brand: %s, Color: %s", session.session_id, message, brand_filter, color_filter)
 
         # Step 1: Generate semantic search query from conversation history + new message
         messages_for_context = [{"role": msg.role, "content": msg.content} for msg in session.messages]
         search_query = await generate_search_query_from_history(messages_for_context, message)
-        logger.info(f"Generated search query: '{search_query}'")
+        logger.info("Generated search query: '%s'", search_query)
+        annotate(rewritten_query=search_query, message_count=len(session.messages))
 
         # Step 2: Perform Weaviate search with generated query and filters
-        from weaviate_client import weaviate_client
-
-        search_results = weaviate_client.semantic_search(
-            query=search_query,
-            limit=10,
+        search_results = fetch_candidate_pool(
+            session.session_id,
+            search_query,
             brand_filter=brand_filter,
             color_filter=color_filter
-        )
+        )[:10]
 
         products = [Product(**result) for result in search_results]
-        logger.info(f"Found {len(products)} products for generated query: '{search_query}' with filters: brand={brand_filter}, color={color_filter}")
+        annotate(result_count=len(products))
+        logger.info("Found %s products for generated query: '%s' with filters: brand=%s, color=%s", len(products), search_query, brand_filter, color_filter)
+        if on_products:
+            await on_products(search_query, products)
 
         # Step 3: Build products context with filter information
-        products_context = ""
-        if products:
-            filter_info = ""
-            if brand_filter or color_filter:
-                filter_parts = []
-                if brand_filter:
-                    filter_parts.append(f"Brand: {brand_filter}")
-                if color_filter:
-                    filter_parts.append(f"Color: {color_filter}")
-                filter_info = f" (FILTERED BY: {', '.join(filter_parts)})"
-
-            products_context = f"SEARCH RESULTS FOR: '{search_query}'{filter_info}\n\n" + "\n".join([
-                f"- {product.title} by {product.brand}"
-                + (f" (Color: {product.color})" if product.color else "")
-                + (f"\n  Description: {product.description[:150]}..." if product.description else "")
-                + (f"\n  Key Features: {product.bullet_points[:100]}..." if product.bullet_points else "")
-                for product in products[:5]  # Limit to first 5 for context
-            ])
-            logger.info(f"Products context created: {products_context[:200]}...")
+        products_context = build_products_context(
+            search_query,
+            products,
+            brand_filter=brand_filter,
+            color_filter=color_filter
+        )
+        if products_context:
+            logger.debug("Products context created: %s...", products_context[:200])
         else:
-            logger.warning(f"No products found for query: '{search_query}' with filters: brand={brand_filter}, color={color_filter}")
+            logger.warning("No products found for query: '%s' with filters: brand=%s, color=%s", search_query, brand_filter, color_filter)
 
         # Step 4: Create user message
         user_message = ChatMessage(
@@ -224,7 +427,7 @@ async def process_chat_message(
 
         # Include recent conversation history for context
         recent_messages = session.messages[-8:] if len(session.messages) > 8 else session.messages
-        logger.debug(f"Using {len(recent_messages)} recent messages for conversation context")
+        logger.debug("Using %s recent messages for conversation context", len(recent_messages))
 
         for msg in recent_messages:
             openai_messages.append({
@@ -248,10 +451,18 @@ async def process_chat_message(
                 previous_response_id = last_assistant_message.response_id
 
         # Step 7: Generate assistant response using Responses API
-        response_data = await openai_client.create_response(
-            openai_messages,
-            previous_response_id=previous_response_id
-        )
+        with time_stage("llm_response"):
+            if on_token:
+                response_data = await openai_client.stream_response(
+                    openai_messages,
+                    on_token,
+                    previous_response_id=previous_response_id
+                )
+            else:
+                response_data = await openai_client.create_response(
+                    openai_messages,
+                    previous_response_id=previous_response_id
+                )
 
         assistant_response = ChatMessage(
             role="assistant",
@@ -264,10 +475,11 @@ async def process_chat_message(
         # Step 8: Update session with new messages and products
         session.messages.extend([user_message, assistant_response])
         session.products = products  # Update with new search results
+        session.search_query = search_query
         session.last_updated = datetime.now()
 
-        logger.info(f"Message processed successfully with {len(products)} products found")
-        logger.debug(f"Assistant response length: {len(response_data['content'])}")
+        logger.info("Message processed successfully with %s products found", len(products))
+        logger.debug("Assistant response length: %s", len(response_data['content']))
 
         return {
             "user_message": user_message,
@@ -278,10 +490,10 @@ async def process_chat_message(
         }
 
     except Exception as e:
-        logger.error(f"Error processing chat message: {str(e)}")
+        logger.error("Error processing chat message: %s", e)
         raise
 
-def validate_session_request(session_id: str, chat_sessions: Dict) -> ChatSession:
+def validate_session_request(session_id: str, session_store: SessionStore) -> ChatSession:
     """
     Validate and retrieve a chat session
     """
@@ -289,9 +501,10 @@ def validate_session_request(session_id: str, chat_sessions: Dict) -> ChatSessio
         logger.warning("Session ID not provided")
         raise ValueError("Session ID is required")
 
-    if session_id not in chat_sessions:
-        logger.warning(f"Session not found: {session_id}")
+    session = session_store.get(session_id)
+    if session is None:
+        logger.warning("Session not found: %s", session_id)
         raise ValueError(f"Chat session {session_id} not found")
 
-    logger.debug(f"Session {session_id} validated successfully")
-    return chat_sessions[session_id]
\ No newline at end of file
+    logger.debug("Session %s validated successfully", session_id)
+    return session
\ No newline at end of file
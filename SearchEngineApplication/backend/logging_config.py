@@ -0,0 +1,165 @@
+import os
+import copy
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# (QueueHandler, QueueListener) pairs; listeners are restarted in forked workers
+_listeners: List[list] = []
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID while still on the calling thread"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Imported lazily: tracing imports config, which sets up logging
+        from tracing import current_request_id
+        record.request_id = current_request_id() or "-"
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Pass only a fraction of INFO-and-below records from the configured loggers (and
+    their children). Warnings and errors are never sampled out.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            candidate = name
+            while candidate:
+                if candidate in self.rates:
+                    rate = self.rates[candidate]
+                    break
+                candidate = candidate.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+            "process": record.process,
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Records that came through a StructuredQueueHandler carry the formatted traceback
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+def parse_sampling_rates(spec: str) -> Dict[str, float]:
+    """Parse 'routes=0.1,helpers=0.25' into {logger name: keep rate}"""
+    rates = {}
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = part.partition("=")
+        rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+_traceback_formatter = logging.Formatter()
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that keeps the traceback apart from the message. The stock prepare()
+    folds the formatted traceback into msg, which hides it from JsonFormatter.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        # Tracebacks cannot cross the queue, so they are formatted here on the caller's thread
+        if record.exc_info:
+            record.exc_text = record.exc_text or _traceback_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+def queued(*handlers: logging.Handler) -> logging.handlers.QueueHandler:
+    """
+    Return a QueueHandler whose records are written by the given handlers on a
+    background listener thread, keeping file and console I/O off the caller's thread
+    """
+    log_queue = queue.Queue(-1)
+    queue_handler = StructuredQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append([queue_handler, listener])
+    return queue_handler
+
+def _restart_listeners() -> None:
+    # Listener threads do not survive fork (gunicorn preloads the app in the master), so
+    # each worker starts its own on a fresh queue; the parent's queued records stay with it
+    for entry in _listeners:
+        queue_handler, listener = entry
+        log_queue = queue.Queue(-1)
+        queue_handler.queue = log_queue
+        entry[1] = logging.handlers.QueueListener(log_queue, *listener.handlers, respect_handler_level=True)
+        entry[1].start()
+
+def _stop_listeners() -> None:
+    for _, listener in _listeners:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listeners)
+atexit.register(_stop_listeners)
+
+def setup_logging(
+    level: str = "INFO",
+    log_file: Optional[str] = "backend.log",
+    json_format: bool = False,
+    sampling: Optional[Dict[str, float]] = None
+) -> None:
+    """
+    Route all application logging through a queue to console and file handlers running
+    on a background thread, with optional per-logger sampling and JSON output.
+    Like logging.basicConfig, this does nothing if the root logger already has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+
+    handlers: List[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    # Filters run on the calling thread before enqueueing, so sampled-out records cost little
+    queue_handler = queued(*handlers)
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper()))
@@ -1,3 +1,5 @@
+import time
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,22 +7,65 @@ from contextlib import asynccontextmanager
 
 from config import config, logger
 from routes import router
+from readiness import readiness
+from startup import warm_up_backend, close_weaviate
+from metrics import in_flight_requests
+from tracing import Trace, new_request_id, start_trace, export_trace
+from slow_query_log import record_if_slow
+from session_store import (
+    session_store, InMemorySessionStore, restore_sessions, snapshot_sessions, snapshot_periodically
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Search Engine Chat API...")
-    logger.info(f"Debug mode: {config.DEBUG}")
-    logger.info(f"OpenAI API configured: {'Yes' if config.OPENAI_API_KEY else 'No'}")
-    logger.info(f"Weaviate configured: {'Yes' if config.WEAVIATE_URL else 'No'}")
+    logger.info("Debug mode: %s", config.DEBUG)
+    logger.info("OpenAI API configured: %s", 'Yes' if config.OPENAI_API_KEY else 'No')
+    logger.info("Weaviate configured: %s", 'Yes' if config.WEAVIATE_URL else 'No')
 
     try:
         from client import openai_client
         logger.info("OpenAI client initialized successfully")
     except Exception as e:
-        logger.error(f"Failed to initialize OpenAI client: {str(e)}")
+        logger.error("Failed to initialize OpenAI client: %s", e)
+
+    # Bring back the sessions of the previous run before serving; bodies load lazily on access.
+    # Each worker of a multi-worker server holds its own sessions, so one shared snapshot
+    # file cannot represent them; snapshots are only taken with a single worker.
+    snapshots_enabled = bool(config.SESSION_SNAPSHOT_PATH) and isinstance(session_store, InMemorySessionStore)
+    if snapshots_enabled and config.WORKERS > 1:
+        logger.warning("Session snapshots disabled: the in-memory session store runs with %s workers", config.WORKERS)
+        snapshots_enabled = False
+
+    snapshot_task = None
+    if snapshots_enabled:
+        await asyncio.to_thread(restore_sessions, config.SESSION_SNAPSHOT_PATH)
+        if config.SESSION_SNAPSHOT_INTERVAL_SECONDS > 0:
+            snapshot_task = asyncio.create_task(
+                snapshot_periodically(config.SESSION_SNAPSHOT_PATH, config.SESSION_SNAPSHOT_INTERVAL_SECONDS)
+            )
+
+    # Connect to Weaviate, check its schema and warm it up, then prewarm the search and
+    # summary caches, all in the background so /healthz answers meanwhile; /readyz reports when done
+    readiness.register("weaviate")
+    if config.PREWARM_ENABLED:
+        readiness.register("prewarm")
+    else:
+        logger.info("Cache prewarming disabled")
+    warm_up_task = asyncio.create_task(warm_up_backend())
 
     yield
 
+    if not warm_up_task.done():
+        warm_up_task.cancel()
+
+    if snapshot_task:
+        snapshot_task.cancel()
+    if snapshots_enabled:
+        await asyncio.to_thread(snapshot_sessions, config.SESSION_SNAPSHOT_PATH)
+
+    close_weaviate()
+
     logger.info("Shutting down Search Engine Chat API...")
 
 app = FastAPI(
@@ -40,12 +85,54 @@ app.add_middleware(
 
 app.include_router(router)
 
+if config.PROFILING_ENABLED:
+    if config.ADMIN_TOKEN:
+        from profiling import router as profiling_router
+        app.include_router(profiling_router)
+        logger.warning("Admin profiling endpoints enabled under /admin/profile")
+    else:
+        logger.warning("PROFILING_ENABLED is set but ADMIN_TOKEN is empty; profiling endpoints not mounted")
+
 @app.middleware("http")
 async def log_requests(request, call_next):
-    logger.info(f"{request.method} {request.url}")
+    # One access line per request, written after the response so it carries status and duration
+    start = time.perf_counter()
     response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
+    logger.info(
+        "%s %s -> %s (%.1f ms)",
+        request.method, request.url.path, response.status_code, (time.perf_counter() - start) * 1000
+    )
     return response
 
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    request_id = new_request_id(request.headers.get("X-Request-ID"))
+    name = f"{request.method} {request.url.path}"
+    if config.TRACING_ENABLED:
+        trace = start_trace(request_id, name)
+    else:
+        # Only timed for the slow-query log: without a current trace, spans and annotations
+        # are not recorded, so the entry has no query context or stage durations
+        trace = Trace(request_id, name)
+
+    response = await call_next(request)
+    trace.finish()
+    trace.attributes["status"] = response.status_code
+
+    response.headers["X-Request-ID"] = request_id
+    if config.TRACING_ENABLED:
+        response.headers["Server-Timing"] = trace.server_timing()
+        export_trace(trace)
+    record_if_slow(trace, request.url.path)
+    return response
+
+@app.middleware("http")
+async def track_in_flight(request, call_next):
+    in_flight_requests.inc()
+    try:
+        return await call_next(request)
+    finally:
+        in_flight_requests.dec()
+
 # FastAPI app is defined above and can be imported by other modules
 # Use run_server.py to start the server
\ No newline at end of file
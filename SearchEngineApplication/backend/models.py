@@ -20,6 +20,8 @@ class StartChatResponse(BaseModel):
     initial_message: ChatMessage
     response_id: str
     status: str
+    summary_cached: bool = False
+    products: List["Product"] = []
 
 class SendMessageRequest(BaseModel):
     session_id: str
@@ -28,6 +30,13 @@ class SendMessageRequest(BaseModel):
     brand_filter: Optional[str] = None
     color_filter: Optional[str] = None
 
+class ChatSocketMessage(BaseModel):
+    """A chat turn sent over /chat/ws/{session_id}; the session is implied by the connection"""
+    message: str
+    user_id: Optional[str] = None
+    brand_filter: Optional[str] = None
+    color_filter: Optional[str] = None
+
 class SendMessageResponse(BaseModel):
     session_id: str
     user_message: ChatMessage
@@ -41,6 +50,7 @@ class Product(BaseModel):
     color: Optional[str] = ""
     description: Optional[str] = ""
     bullet_points: Optional[str] = ""
+    summary: Optional[str] = ""
     price: str = "Price not available"
     image_url: str = ""
     rating: float = 0.0
@@ -56,12 +66,30 @@ class ChatSession(BaseModel):
     search_query: Optional[str] = None
     products: List[Product] = []
 
+class SessionSummary(BaseModel):
+    session_id: str
+    user_id: Optional[str]
+    created_at: datetime
+    last_updated: datetime
+    last_query: Optional[str] = None
+    message_count: int = 0
+
+class SessionListResponse(BaseModel):
+    sessions: List[SessionSummary]
+    count: int
+    next_cursor: Optional[str] = None
+
 class SearchRequest(BaseModel):
     query: str
     limit: Optional[int] = 10
     brand_filter: Optional[str] = None
     color_filter: Optional[str] = None
 
+class RefineRequest(BaseModel):
+    brand_filter: Optional[str] = None
+    color_filter: Optional[str] = None
+    limit: int = 10
+
 class SearchResponse(BaseModel):
     products: List[Product]
     total_results: int
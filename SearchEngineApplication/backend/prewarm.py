@@ -0,0 +1,81 @@
+import os
+import time
+import asyncio
+import logging
+from typing import List
+from config import config
+from models import Product
+from client import Priority
+from helpers import cached_semantic_search, generate_initial_summary, build_summary_cache_key
+from context_builder import build_products_context
+from query_log import top_queries
+from readiness import readiness
+
+logger = logging.getLogger(__name__)
+
+def load_prewarm_queries() -> List[str]:
+    """
+    Read queries to prewarm from PREWARM_QUERIES_FILE, falling back to the most
+    frequent queries in the backend's own query log
+    """
+    path = config.PREWARM_QUERIES_FILE
+    if path:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as queries_file:
+                queries = [line.strip() for line in queries_file if line.strip() and not line.startswith("#")]
+            logger.info("Loaded %s prewarm queries from %s", len(queries), path)
+            return queries[:config.PREWARM_TOP_QUERIES]
+        logger.warning("Prewarm queries file not found: %s, falling back to the query log", path)
+
+    queries = top_queries(config.PREWARM_TOP_QUERIES)
+    logger.info("Loaded %s prewarm queries from the query log", len(queries))
+    return queries
+
+async def prewarm_query(query: str) -> None:
+    """
+    Run one query through the chat start search and summary path to populate both caches.
+    The search uses the candidate pool limit, which is part of the search cache key.
+    """
+    candidate_pool = await asyncio.to_thread(cached_semantic_search, query, config.CANDIDATE_POOL_SIZE)
+    products = [Product(**result) for result in candidate_pool[:10]]
+
+    products_context = build_products_context(query, products)
+    summary_cache_key = build_summary_cache_key(query, None, None, [product.id for product in products[:5]])
+    await generate_initial_summary(query, products_context, summary_cache_key, priority=Priority.BACKGROUND)
+
+async def prewarm_caches() -> None:
+    """
+    Prewarm the search and summary caches with bounded concurrency, then mark
+    the prewarm readiness component as ready
+    """
+    start_time = time.time()
+    try:
+        queries = await asyncio.to_thread(load_prewarm_queries)
+        if not queries:
+            readiness.mark("prewarm", True, "no queries to prewarm")
+            return
+
+        semaphore = asyncio.Semaphore(config.PREWARM_CONCURRENCY)
+        failures = 0
+
+        async def run(query: str) -> None:
+            nonlocal failures
+            async with semaphore:
+                try:
+                    await prewarm_query(query)
+                except Exception as e:
+                    failures += 1
+                    logger.warning("Prewarm failed for query '%s': %s", query, e)
+
+        await asyncio.gather(*(run(query) for query in queries))
+
+        elapsed = time.time() - start_time
+        readiness.mark("prewarm", True, f"{len(queries) - failures}/{len(queries)} queries warmed in {elapsed:.1f}s")
+
+    except asyncio.CancelledError:
+        logger.info("Cache prewarming cancelled")
+        raise
+    except Exception as e:
+        # A failed prewarm only costs latency, so it must not keep the app out of rotation
+        logger.error("Cache prewarming failed: %s", e)
+        readiness.mark("prewarm", True, f"failed: {str(e)}")
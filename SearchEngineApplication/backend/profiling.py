@@ -0,0 +1,152 @@
+import os
+import sys
+import hmac
+import time
+import pickle
+import marshal
+import asyncio
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response, PlainTextResponse
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Only one profiler may run per worker: cProfile and tracemalloc are process-wide
+_profile_lock = asyncio.Lock()
+
+def require_admin_token(x_admin_token: str = Header(default="")) -> None:
+    """Reject requests that do not carry the configured ADMIN_TOKEN"""
+    if not config.ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin_token)])
+
+def _attachment(content: bytes, kind: str, extension: str, media_type: str) -> Response:
+    filename = f"{kind}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _check_seconds(seconds: float) -> None:
+    if seconds > config.PROFILING_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {config.PROFILING_MAX_SECONDS}")
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # Collapsed stack frames are separated by ';', so it cannot appear in a label
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def sample_stacks(seconds: float, interval: float) -> Counter:
+    """
+    Sample the Python stacks of every other thread for the given duration and count
+    identical stacks, root frame first
+    """
+    own_thread = threading.get_ident()
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(thread_names.get(thread_id, str(thread_id)).replace(";", ":"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+
+    return stacks
+
+@router.get("/cpu")
+async def profile_cpu(seconds: float = Query(10, gt=0)):
+    """
+    Run cProfile on the event loop thread for the given duration and download the
+    result as a pstats file (load with pstats.Stats or snakeviz)
+    """
+    _check_seconds(seconds)
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+
+    async with _profile_lock:
+        logger.warning("Starting %.1fs cProfile capture in worker %s", seconds, os.getpid())
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+        profiler.create_stats()
+        # pstats files are the marshalled stats dict, exactly what Profile.dump_stats writes
+        return _attachment(marshal.dumps(profiler.stats), "cpu", "pstats", "application/octet-stream")
+
+@router.get("/stacks")
+async def profile_stacks(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000)
+):
+    """
+    Statistically sample all threads' stacks (event loop and worker threads) and download
+    them as collapsed stacks, the input format of flamegraph.pl and speedscope
+    """
+    _check_seconds(seconds)
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+
+    async with _profile_lock:
+        logger.warning("Starting %.1fs stack sampling in worker %s", seconds, os.getpid())
+        stacks = await asyncio.to_thread(sample_stacks, seconds, interval_ms / 1000)
+
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return _attachment((collapsed + "\n").encode("utf-8"), "stacks", "collapsed", "text/plain")
+
+@router.get("/memory")
+async def profile_memory(
+    seconds: float = Query(10, ge=0),
+    limit: int = Query(50, gt=0, le=1000),
+    frames: int = Query(10, gt=0, le=100),
+    format: str = Query("text", pattern="^(text|snapshot)$")
+):
+    """
+    Trace allocations for the given duration. Returns the top allocation sites that grew
+    as text, or with format=snapshot a tracemalloc snapshot (tracemalloc.Snapshot.load)
+    """
+    _check_seconds(seconds)
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+
+    async with _profile_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        logger.warning("Starting %.1fs tracemalloc capture in worker %s", seconds, os.getpid())
+
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    if format == "snapshot":
+        content = await asyncio.to_thread(pickle.dumps, after, pickle.HIGHEST_PROTOCOL)
+        return _attachment(content, "memory", "tracemalloc", "application/octet-stream")
+
+    def report() -> str:
+        traced_bytes = sum(stat.size for stat in after.statistics("filename"))
+        lines = [f"Worker {os.getpid()}: {traced_bytes / 1024 / 1024:.1f} MiB traced, top {limit} growth over {seconds}s"]
+        lines += [str(stat) for stat in after.compare_to(before, "lineno")[:limit]]
+        return "\n".join(lines) + "\n"
+
+    return PlainTextResponse(await asyncio.to_thread(report))
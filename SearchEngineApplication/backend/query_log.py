@@ -0,0 +1,75 @@
+import os
+import logging
+import logging.handlers
+from collections import Counter
+from typing import List
+from config import config
+from logging_config import queued
+
+logger = logging.getLogger(__name__)
+
+# User-entered queries are written one per line through a dedicated logger, so the log
+# is appended by the logging machinery rather than by ad-hoc file handling. It is a child
+# of this module's logger, whose own messages must not end up in the file as queries.
+# WatchedFileHandler reopens the file after compact_query_log replaces it.
+_query_logger = logging.getLogger("query_log.queries")
+_query_logger.propagate = False
+_query_logger.setLevel(logging.INFO)
+
+if config.QUERY_LOG_PATH:
+    _handler = logging.handlers.WatchedFileHandler(config.QUERY_LOG_PATH)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _query_logger.addHandler(queued(_handler))
+
+# Compacted entries are written as "<count>\t<query>"; normalized queries never contain a
+# tab, so they cannot be mistaken for one
+_COUNT_SEPARATOR = "\t"
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+def record_query(query: str) -> None:
+    """Append a user-entered search query to the query log"""
+    normalized = _normalize(query)
+    if normalized:
+        _query_logger.info(normalized)
+
+def _read_counts(path: str) -> Counter:
+    counts: Counter = Counter()
+    with open(path, encoding="utf-8") as log_file:
+        for line in log_file:
+            line = line.strip("\n")
+            count, separator, query = line.partition(_COUNT_SEPARATOR)
+            if separator and count.isdigit():
+                counts[query] += int(count)
+            elif line.strip():
+                counts[line.strip()] += 1
+    return counts
+
+def compact_query_log(counts: Counter) -> None:
+    """
+    Replace the query log with one count line for each of its QUERY_LOG_MAX_DISTINCT most
+    frequent queries, bounding the file and the work of reading it at the next startup
+    """
+    path = config.QUERY_LOG_PATH
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for query, count in counts.most_common(config.QUERY_LOG_MAX_DISTINCT):
+            f.write(f"{count}{_COUNT_SEPARATOR}{query}\n")
+    os.replace(tmp_path, path)
+    logger.info("Compacted query log %s to %s distinct queries", path, min(len(counts), config.QUERY_LOG_MAX_DISTINCT))
+
+def top_queries(limit: int) -> List[str]:
+    """Return the most frequent queries from the query log, compacting it once it is too large"""
+    if not config.QUERY_LOG_PATH:
+        return []
+
+    try:
+        counts = _read_counts(config.QUERY_LOG_PATH)
+        if os.path.getsize(config.QUERY_LOG_PATH) > config.QUERY_LOG_MAX_BYTES:
+            compact_query_log(counts)
+    except FileNotFoundError:
+        logger.info("No query log found at %s", config.QUERY_LOG_PATH)
+        return []
+
+    return [query for query, _ in counts.most_common(limit)]
@@ -0,0 +1,35 @@
+import time
+import logging
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+class ReadinessState:
+    """
+    Tracks startup components that must finish before the app reports ready.
+    Liveness does not depend on this state.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, Dict] = {}
+        self._started_at = time.time()
+
+    def register(self, name: str, detail: str = "pending") -> None:
+        """Declare a component that readiness waits on"""
+        self._components[name] = {"ready": False, "detail": detail, "updated_at": time.time()}
+
+    def mark(self, name: str, ready: bool, detail: str = "") -> None:
+        self._components[name] = {"ready": ready, "detail": detail, "updated_at": time.time()}
+        logger.info("Readiness component '%s': %s %s", name, "ready" if ready else "not ready", detail)
+
+    def is_ready(self) -> bool:
+        return all(component["ready"] for component in self._components.values())
+
+    def snapshot(self) -> Dict:
+        return {
+            "ready": self.is_ready(),
+            "uptime_seconds": round(time.time() - self._started_at, 1),
+            "components": dict(self._components)
+        }
+
+readiness = ReadinessState()
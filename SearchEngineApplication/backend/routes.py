@@ -1,16 +1,30 @@
 import logging
-from typing import Dict, Optional
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+from pydantic import ValidationError
 from models import (
-    StartChatRequest, StartChatResponse, SendMessageRequest,
-    SendMessageResponse, SearchRequest, SearchResponse, Product
+    StartChatRequest, StartChatResponse, SendMessageRequest, ChatSocketMessage,
+    SendMessageResponse, SearchRequest, SearchResponse, RefineRequest, Product, SessionListResponse
 )
-from helpers import process_chat_start, process_chat_message, validate_session_request
+from helpers import (
+    process_chat_start, process_chat_message, validate_session_request, build_summary_cache_key,
+    cached_semantic_search, store_candidate_pool, refine_session_products
+)
+from session_store import session_store
+from context_builder import build_products_context
+from client import SchedulerOverloadedError
+from query_log import record_query
+from readiness import readiness
+from metrics import registry
+from tracing import annotate, new_request_id, start_trace, export_trace
+from slow_query_log import record_if_slow
+from config import config
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-chat_sessions: Dict = {}
 
 @router.get("/")
 async def health_check():
@@ -18,79 +32,106 @@ async def health_check():
     logger.info("Health check endpoint accessed")
     return {"message": "Search Engine Chat API is running", "status": "healthy"}
 
+@router.get("/healthz")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests, whether or not startup has finished"""
+    return {"status": "alive", "ready": readiness.is_ready()}
+
+@router.get("/readyz")
+async def readiness_check():
+    """Readiness probe: Weaviate is connected and warmed up and cache prewarming has finished"""
+    snapshot = readiness.snapshot()
+    if not snapshot["ready"]:
+        return JSONResponse(status_code=503, content=snapshot)
+    return snapshot
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker process"""
+    return Response(content=registry.render(), media_type=registry.content_type)
+
 @router.post("/chat/start", response_model=StartChatResponse)
 async def start_chat(request: StartChatRequest):
     """
     Start a new chat session with an initial search query and perform product search
     """
     try:
-        logger.info(f"Starting new chat session for query: '{request.query}' with filters - Brand: {request.brand_filter}, Color: {request.color_filter}")
+        logger.info("Starting new chat session for query: '%s' with filters - Brand: %s, Color: %s", request.query, request.brand_filter, request.color_filter)
 
-        # Perform product search first
-        from weaviate_client import weaviate_client
+        record_query(request.query)
+        annotate(query=request.query, brand_filter=request.brand_filter, color_filter=request.color_filter)
 
-        search_results = weaviate_client.semantic_search(
+        # Perform product search first, over-fetching the session's candidate pool
+        candidate_pool = cached_semantic_search(
             query=request.query,
-            limit=10,
+            limit=config.CANDIDATE_POOL_SIZE,
             brand_filter=request.brand_filter,
             color_filter=request.color_filter
         )
+        search_results = candidate_pool[:10]
 
         products = [Product(**result) for result in search_results]
-        logger.info(f"Found {len(products)} products for chat context")
+        logger.info("Found %s products for chat context", len(products))
+        annotate(result_count=len(products))
 
         if products:
-            logger.info(f"Sample products found: {[p.title for p in products[:3]]}")
+            logger.debug("Sample products found: %s", [p.title for p in products[:3]])
         else:
             logger.warning("NO PRODUCTS FOUND in search results - this will cause 'no products' response!")
 
         # Create products context string for system prompt
-        products_context = ""
-        if products:
-            # Add filter information to the context if filters were applied
-            filter_info = ""
-            if request.brand_filter or request.color_filter:
-                filter_parts = []
-                if request.brand_filter:
-                    filter_parts.append(f"Brand: {request.brand_filter}")
-                if request.color_filter:
-                    filter_parts.append(f"Color: {request.color_filter}")
-                filter_info = f" (FILTERED BY: {', '.join(filter_parts)})"
-
-            products_context = f"SEARCH RESULTS FOR: '{request.query}'{filter_info}\n\n" + "\n".join([
-                f"- {product.title} by {product.brand}"
-                + (f" (Color: {product.color})" if product.color else "")
-                + (f"\n  Description: {product.description[:150]}..." if product.description else "")
-                + (f"\n  Key Features: {product.bullet_points[:100]}..." if product.bullet_points else "")
-                for product in products[:5]  # Limit to first 5 for context
-            ])
-            logger.info(f"Products context created with filters: {products_context[:200]}...")
+        products_context = build_products_context(
+            request.query,
+            products,
+            brand_filter=request.brand_filter,
+            color_filter=request.color_filter
+        )
+        if products_context:
+            logger.debug("Products context created with filters: %s...", products_context[:200])
         else:
             logger.error("Products context is EMPTY - this will cause AI to say 'no products found'")
 
-        result = await process_chat_start(request.query, request.user_id, products_context)
+        summary_cache_key = build_summary_cache_key(
+            request.query,
+            request.brand_filter,
+            request.color_filter,
+            [product.id for product in products[:5]]
+        )
+
+        result = await process_chat_start(
+            request.query,
+            request.user_id,
+            products_context,
+            summary_cache_key=summary_cache_key
+        )
         session = result["session"]
 
         # Add search query and products to session
         session.search_query = request.query
         session.products = products
 
-        chat_sessions[session.session_id] = session
+        session_store.put(session)
+        store_candidate_pool(session.session_id, request.query, request.brand_filter, request.color_filter, candidate_pool)
 
-        logger.info(f"Chat session {session.session_id} stored successfully with {len(products)} products")
+        logger.info("Chat session %s stored successfully with %s products", session.session_id, len(products))
 
         return StartChatResponse(
             session_id=session.session_id,
             initial_message=session.messages[-1],
             response_id=result["response_id"],
-            status="success"
+            status="success",
+            summary_cached=result["summary_cached"],
+            products=products
         )
 
     except ValueError as e:
-        logger.error(f"Validation error starting chat: {str(e)}")
+        logger.error("Validation error starting chat: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
+    except SchedulerOverloadedError as e:
+        logger.warning("OpenAI capacity exhausted starting chat: %s", e)
+        raise HTTPException(status_code=503, detail=f"AI assistant is busy, please retry: {str(e)}", headers={"Retry-After": "5"})
     except Exception as e:
-        logger.error(f"Error starting chat: {str(e)}")
+        logger.error("Error starting chat: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to start chat: {str(e)}")
 
 @router.post("/chat/message", response_model=SendMessageResponse)
@@ -99,9 +140,10 @@ async def send_message(request: SendMessageRequest):
     Send a message in an existing chat session with fresh search on every message
     """
     try:
-        logger.info(f"Sending message to session {request.session_id}: '{request.message}' with filters - Brand: {request.brand_filter}, Color: {request.color_filter}")
+        logger.info("Sending message to session %s: '%s' with filters - Brand: %s, Color: %s", request.session_id, request.message, request.brand_filter, request.color_filter)
 
-        session = validate_session_request(request.session_id, chat_sessions)
+        annotate(query=request.message, brand_filter=request.brand_filter, color_filter=request.color_filter)
+        session = validate_session_request(request.session_id, session_store)
 
         # Process chat message with filters - this will perform a fresh search
         result = await process_chat_message(
@@ -112,9 +154,9 @@ async def send_message(request: SendMessageRequest):
             request.color_filter
         )
 
-        chat_sessions[request.session_id] = session
+        session_store.put(session)
 
-        logger.info(f"Message processed successfully with search query: '{result.get('search_query_used')}', found {result.get('products_found')} products")
+        logger.info("Message processed successfully with search query: '%s', found %s products", result.get('search_query_used'), result.get('products_found'))
 
         return SendMessageResponse(
             session_id=request.session_id,
@@ -124,27 +166,139 @@ async def send_message(request: SendMessageRequest):
         )
 
     except ValueError as e:
-        logger.error(f"Validation error sending message: {str(e)}")
+        logger.error("Validation error sending message: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
+    except SchedulerOverloadedError as e:
+        logger.warning("OpenAI capacity exhausted sending message: %s", e)
+        raise HTTPException(status_code=503, detail=f"AI assistant is busy, please retry: {str(e)}", headers={"Retry-After": "5"})
     except Exception as e:
-        logger.error(f"Error sending message: {str(e)}")
+        logger.error("Error sending message: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to send message: {str(e)}")
 
+async def _send_socket_error(websocket: WebSocket, detail: str, retryable: bool = False) -> None:
+    try:
+        await websocket.send_json({"type": "error", "detail": detail, "retryable": retryable})
+    except Exception:
+        # The client is gone; the receive loop notices on its next read
+        pass
+
+async def _process_socket_turn(websocket: WebSocket, session_id: str, request: ChatSocketMessage) -> bool:
+    """
+    Run one chat turn over a socket, pushing results and reply tokens as they are ready.
+    Returns False when the session was deleted, or changed by another request while the
+    turn ran; the turn is then not stored and the socket should be closed.
+    """
+    trace = start_trace(new_request_id(), "WS /chat/ws")
+    annotate(query=request.message, brand_filter=request.brand_filter, color_filter=request.color_filter)
+
+    async def send_products(search_query: str, products: List[Product]) -> None:
+        await websocket.send_json({
+            "type": "products",
+            "search_query": search_query,
+            "products": [product.model_dump(mode="json") for product in products]
+        })
+
+    async def send_token(delta: str) -> None:
+        await websocket.send_json({"type": "token", "delta": delta})
+
+    try:
+        # Loaded per turn, so changes made over HTTP between turns (a refine, another tab)
+        # are picked up, and a deleted or expired session is not brought back
+        try:
+            session = validate_session_request(session_id, session_store)
+        except ValueError as e:
+            trace.attributes["status"] = "not_found"
+            await _send_socket_error(websocket, str(e))
+            return False
+        loaded_version = session.last_updated
+
+        result = await process_chat_message(
+            session,
+            request.message,
+            request.user_id,
+            request.brand_filter,
+            request.color_filter,
+            on_products=send_products,
+            on_token=send_token
+        )
+
+        current = session_store.get(session_id)
+        if current is None or current.last_updated != loaded_version:
+            trace.attributes["status"] = "conflict"
+            logger.warning("Chat session %s was deleted or changed during a socket turn; not storing it", session_id)
+            await _send_socket_error(websocket, f"Chat session {session_id} was deleted or changed elsewhere, please reload it")
+            return False
+
+        session_store.put(session)
+        trace.attributes["status"] = "success"
+
+        await websocket.send_json({
+            "type": "done",
+            "user_message": result["user_message"].model_dump(mode="json"),
+            "assistant_response": result["assistant_response"].model_dump(mode="json")
+        })
+
+    except SchedulerOverloadedError as e:
+        trace.attributes["status"] = "overloaded"
+        logger.warning("OpenAI capacity exhausted on chat socket: %s", e)
+        await _send_socket_error(websocket, f"AI assistant is busy, please retry: {str(e)}", retryable=True)
+    except Exception as e:
+        trace.attributes["status"] = "error"
+        logger.error("Error processing chat socket message: %s", e)
+        await _send_socket_error(websocket, f"Failed to send message: {str(e)}")
+    finally:
+        trace.finish()
+        export_trace(trace)
+        record_if_slow(trace, "/chat/ws")
+    return True
+
+@router.websocket("/chat/ws/{session_id}")
+async def chat_socket(websocket: WebSocket, session_id: str):
+    """
+    Chat over one long-lived connection. Each client frame is a ChatSocketMessage and is
+    answered with a "products" event once the search finishes, "token" events as the
+    reply streams, and a final "done" (or "error") event. The socket is closed with 4404
+    once the session is deleted, expires, or is changed elsewhere in the middle of a turn.
+    """
+    await websocket.accept()
+    try:
+        session = validate_session_request(session_id, session_store)
+    except ValueError as e:
+        await _send_socket_error(websocket, str(e))
+        await websocket.close(code=4404)
+        return
+
+    logger.info("Chat socket opened for session %s", session_id)
+    await websocket.send_json({"type": "session", "session_id": session_id, "message_count": len(session.messages)})
+
+    try:
+        while True:
+            try:
+                request = ChatSocketMessage.model_validate_json(await websocket.receive_text())
+            except ValidationError as e:
+                await _send_socket_error(websocket, f"Invalid message: {e.errors()[0]['msg']}")
+                continue
+            if not await _process_socket_turn(websocket, session_id, request):
+                await websocket.close(code=4404)
+                return
+    except WebSocketDisconnect:
+        logger.info("Chat socket closed for session %s", session_id)
+
 @router.get("/chat/{session_id}")
 async def get_chat_session(session_id: str):
     """
     Get chat session details and message history
     """
     try:
-        logger.info(f"Retrieving chat session: {session_id}")
+        logger.info("Retrieving chat session: %s", session_id)
 
-        session = validate_session_request(session_id, chat_sessions)
+        session = validate_session_request(session_id, session_store)
 
-        logger.info(f"Chat session {session_id} retrieved successfully")
+        logger.info("Chat session %s retrieved successfully", session_id)
         return session
 
     except ValueError as e:
-        logger.error(f"Error retrieving chat session: {str(e)}")
+        logger.error("Error retrieving chat session: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/chat/{session_id}")
@@ -153,67 +307,83 @@ async def delete_chat_session(session_id: str):
     Delete a chat session
     """
     try:
-        logger.info(f"Deleting chat session: {session_id}")
+        logger.info("Deleting chat session: %s", session_id)
 
-        validate_session_request(session_id, chat_sessions)
-        del chat_sessions[session_id]
+        validate_session_request(session_id, session_store)
+        session_store.delete(session_id)
 
-        logger.info(f"Chat session {session_id} deleted successfully")
+        logger.info("Chat session %s deleted successfully", session_id)
         return {"message": "Chat session deleted successfully", "status": "success"}
 
     except ValueError as e:
-        logger.error(f"Error deleting chat session: {str(e)}")
+        logger.error("Error deleting chat session: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.get("/chat/sessions/list")
-async def list_chat_sessions(user_id: Optional[str] = None):
+@router.get("/chat/sessions/list", response_model=SessionListResponse)
+async def list_chat_sessions(
+    user_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None
+):
     """
-    List all chat sessions, optionally filtered by user_id
+    List chat session summaries, most recently updated first, optionally filtered by
+    user_id. Pass the returned next_cursor to fetch the following page; full session
+    details are available from /chat/{session_id}.
     """
     try:
-        logger.info(f"Listing chat sessions (user_id: {user_id})")
+        logger.info("Listing chat sessions (user_id: %s, limit: %s)", user_id, limit)
 
-        if user_id:
-            filtered_sessions = {
-                sid: session for sid, session in chat_sessions.items()
-                if session.user_id == user_id
-            }
-            logger.info(f"Found {len(filtered_sessions)} sessions for user {user_id}")
-            return {"sessions": filtered_sessions, "count": len(filtered_sessions)}
+        summaries, next_cursor = session_store.list_summaries(user_id=user_id, limit=limit, cursor=cursor)
+        logger.info("Returning %s session summaries", len(summaries))
 
-        logger.info(f"Returning all {len(chat_sessions)} sessions")
-        return {"sessions": chat_sessions, "count": len(chat_sessions)}
+        return SessionListResponse(sessions=summaries, count=len(summaries), next_cursor=next_cursor)
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Error listing chat sessions: {str(e)}")
+        logger.error("Error listing chat sessions: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to list sessions: {str(e)}")
 
+@router.get("/chat/sessions/stats")
+async def get_session_store_stats():
+    """
+    Get session store size and memory usage
+    """
+    try:
+        stats = session_store.stats()
+        logger.info("Session store stats: %s", stats)
+        return {"stats": stats, "status": "success"}
+
+    except Exception as e:
+        logger.error("Error getting session store stats: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to get session stats: {str(e)}")
+
 @router.get("/chat/{session_id}/responses")
 async def get_conversation_responses(session_id: str):
     """
     Get all responses for a conversation using OpenAI Responses API
     """
     try:
-        logger.info(f"Getting conversation responses for session: {session_id}")
+        logger.info("Getting conversation responses for session: %s", session_id)
 
-        session = validate_session_request(session_id, chat_sessions)
+        session = validate_session_request(session_id, session_store)
 
         if hasattr(session, 'conversation_id') and session.conversation_id:
             from client import openai_client
             responses = await openai_client.list_conversation_responses(
                 conversation_id=session.conversation_id
             )
-            logger.info(f"Retrieved {len(responses)} responses from OpenAI")
+            logger.info("Retrieved %s responses from OpenAI", len(responses))
             return {"responses": responses, "count": len(responses)}
         else:
-            logger.warning(f"No conversation_id found for session {session_id}")
+            logger.warning("No conversation_id found for session %s", session_id)
             return {"responses": [], "count": 0, "message": "No conversation ID available"}
 
     except ValueError as e:
-        logger.error(f"Error getting conversation responses: {str(e)}")
+        logger.error("Error getting conversation responses: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting conversation responses: {str(e)}")
+        logger.error("Error getting conversation responses: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get responses: {str(e)}")
 
 @router.post("/search", response_model=SearchResponse)
@@ -222,11 +392,12 @@ async def search_products(request: SearchRequest):
     Search for products using Weaviate semantic search
     """
     try:
-        logger.info(f"Searching for products: '{request.query}'")
+        logger.info("Searching for products: '%s'", request.query)
 
-        from weaviate_client import weaviate_client
+        record_query(request.query)
+        annotate(query=request.query, brand_filter=request.brand_filter, color_filter=request.color_filter)
 
-        results = weaviate_client.semantic_search(
+        results = cached_semantic_search(
             query=request.query,
             limit=request.limit,
             brand_filter=request.brand_filter,
@@ -234,8 +405,9 @@ async def search_products(request: SearchRequest):
         )
 
         products = [Product(**result) for result in results]
+        annotate(result_count=len(products))
 
-        logger.info(f"Search completed: found {len(products)} products")
+        logger.info("Search completed: found %s products", len(products))
 
         return SearchResponse(
             products=products,
@@ -244,7 +416,7 @@ async def search_products(request: SearchRequest):
         )
 
     except Exception as e:
-        logger.error(f"Error searching products: {str(e)}")
+        logger.error("Error searching products: %s", e)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 @router.get("/search/brands")
@@ -258,11 +430,11 @@ async def get_available_brands():
         from weaviate_client import weaviate_client
         brands = weaviate_client.get_available_brands()
 
-        logger.info(f"Found {len(brands)} brands")
+        logger.info("Found %s brands", len(brands))
         return {"brands": brands, "count": len(brands), "status": "success"}
 
     except Exception as e:
-        logger.error(f"Error fetching brands: {str(e)}")
+        logger.error("Error fetching brands: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch brands: {str(e)}")
 
 @router.get("/search/colors")
@@ -276,26 +448,64 @@ async def get_available_colors():
         from weaviate_client import weaviate_client
         colors = weaviate_client.get_available_colors()
 
-        logger.info(f"Found {len(colors)} colors")
+        logger.info("Found %s colors", len(colors))
         return {"colors": colors, "count": len(colors), "status": "success"}
 
     except Exception as e:
-        logger.error(f"Error fetching colors: {str(e)}")
+        logger.error("Error fetching colors: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to fetch colors: {str(e)}")
 
+@router.post("/chat/{session_id}/refine", response_model=SearchResponse)
+async def refine_session(session_id: str, request: RefineRequest):
+    """
+    Narrow a session's products to new brand/color filters, answered from the session's
+    candidate pool when it holds enough matches
+    """
+    try:
+        logger.info("Refining session %s with filters - Brand: %s, Color: %s", session_id, request.brand_filter, request.color_filter)
+        annotate(brand_filter=request.brand_filter, color_filter=request.color_filter)
+
+        session = validate_session_request(session_id, session_store)
+
+        results = refine_session_products(
+            session,
+            brand_filter=request.brand_filter,
+            color_filter=request.color_filter,
+            limit=request.limit
+        )
+        products = [Product(**result) for result in results]
+
+        # Later chat turns and /products see the refined results
+        session.products = products
+        session.last_updated = datetime.now()
+        session_store.put(session)
+
+        return SearchResponse(
+            products=products,
+            total_results=len(products),
+            status="success"
+        )
+
+    except ValueError as e:
+        logger.error("Error refining session products: %s", e)
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Error refining session products: %s", e)
+        raise HTTPException(status_code=500, detail=f"Failed to refine session products: {str(e)}")
+
 @router.get("/chat/{session_id}/products", response_model=SearchResponse)
 async def get_session_products(session_id: str):
     """
     Get products associated with a chat session
     """
     try:
-        logger.info(f"Getting products for session: {session_id}")
+        logger.info("Getting products for session: %s", session_id)
 
-        session = validate_session_request(session_id, chat_sessions)
+        session = validate_session_request(session_id, session_store)
 
         products = session.products if hasattr(session, 'products') and session.products else []
 
-        logger.info(f"Found {len(products)} products for session {session_id}")
+        logger.info("Found %s products for session %s", len(products), session_id)
         return SearchResponse(
             products=products,
             total_results=len(products),
@@ -303,8 +513,8 @@ async def get_session_products(session_id: str):
         )
 
     except ValueError as e:
-        logger.error(f"Error getting session products: {str(e)}")
+        logger.error("Error getting session products: %s", e)
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Error getting session products: {str(e)}")
+        logger.error("Error getting session products: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get session products: {str(e)}")
\ No newline at end of file
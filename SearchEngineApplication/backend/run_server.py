@@ -2,6 +2,33 @@
 Script to run the FastAPI backend server
 """
 
+def run_gunicorn(workers: int) -> None:
+    """Run the app under gunicorn with uvicorn workers, preloading it in the master process"""
+    from gunicorn.app.base import BaseApplication
+    from config import config
+
+    class PreloadedApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    PreloadedApplication({
+        "bind": f"{config.API_HOST}:{config.API_PORT}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "loglevel": config.LOG_LEVEL.lower(),
+        "timeout": 180
+    }).run()
+
 if __name__ == "__main__":
     import uvicorn
     from config import config
@@ -16,10 +43,34 @@ if __name__ == "__main__":
 
     logger.info("Server startup initiated")
 
-    uvicorn.run(
-        "main:app",
-        host=config.API_HOST,
-        port=config.API_PORT,
-        reload=config.DEBUG,
-        log_level=config.LOG_LEVEL.lower()
-    )
\ No newline at end of file
+    if config.WORKERS > 1:
+        print(f"⚙️  Multi-worker mode: {config.WORKERS} workers sharing state in {config.SHARED_STATE_PATH}")
+        logger.info(
+            "Starting %s workers (sessions: %s, caches: %s)",
+            config.WORKERS, config.SESSION_STORE_BACKEND, config.CACHE_BACKEND
+        )
+        if config.SESSION_STORE_BACKEND != "sqlite" or config.CACHE_BACKEND != "sqlite":
+            logger.warning("Process-local session store or caches in multi-worker mode; chat sessions will not be shared")
+        if config.DEBUG:
+            logger.warning("Auto-reload is not available in multi-worker mode and has been disabled")
+
+        try:
+            run_gunicorn(config.WORKERS)
+        except ImportError:
+            # gunicorn is unavailable (e.g. on Windows): let uvicorn spawn the workers instead
+            logger.warning("gunicorn not installed, falling back to uvicorn workers without app preloading")
+            uvicorn.run(
+                "main:app",
+                host=config.API_HOST,
+                port=config.API_PORT,
+                workers=config.WORKERS,
+                log_level=config.LOG_LEVEL.lower()
+            )
+    else:
+        uvicorn.run(
+            "main:app",
+            host=config.API_HOST,
+            port=config.API_PORT,
+            reload=config.DEBUG,
+            log_level=config.LOG_LEVEL.lower()
+        )
@@ -0,0 +1,135 @@
+import os
+import mmap
+import zlib
+import struct
+import logging
+from datetime import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Union
+from models import SessionSummary
+
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   header   MAGIC, record count, index offset
+#   bodies   zlib-compressed session JSON, one blob per session
+#   index    one fixed-size record per session followed by its UTF-8 strings
+# The index is small and read eagerly on restore; bodies are only decompressed when a
+# session is first accessed.
+MAGIC = b"SESSNAP1"
+_HEADER = struct.Struct("<8sIQ")
+# body offset, body length, uncompressed size, last access, created_at, last_updated,
+# message count, flags, session_id/user_id/last_query byte lengths
+_RECORD = struct.Struct("<QIIdddIBIII")
+
+_HAS_USER_ID = 1
+_HAS_LAST_QUERY = 2
+
+COMPRESSION_LEVEL = 1
+
+class LazyBody:
+    """A session body still sitting compressed in a mapped snapshot file"""
+
+    __slots__ = ("_buffer", "_offset", "_length")
+
+    def __init__(self, buffer: mmap.mmap, offset: int, length: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._length = length
+
+    def compressed(self) -> bytes:
+        return self._buffer[self._offset:self._offset + self._length]
+
+    def load(self) -> str:
+        return zlib.decompress(self.compressed()).decode("utf-8")
+
+class SnapshotRecord(NamedTuple):
+    session_id: str
+    data: Union[str, LazyBody]
+    size_bytes: int
+    last_access: float
+    summary: SessionSummary
+
+def write_snapshot(path: str, records: Iterable[SnapshotRecord]) -> int:
+    """
+    Atomically write records to path, in order. Bodies that were never loaded since the
+    last restore are copied across still compressed. A record that does not fit the
+    format is logged and left out rather than failing the whole snapshot. Returns the
+    number of records written.
+    """
+    # Unique per process, so concurrent writers never share a temporary file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    index: List[bytes] = []
+
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        offset = _HEADER.size
+        for record in records:
+            if isinstance(record.data, LazyBody):
+                body = record.data.compressed()
+            else:
+                body = zlib.compress(record.data.encode("utf-8"), COMPRESSION_LEVEL)
+
+            summary = record.summary
+            session_id = record.session_id.encode("utf-8")
+            user_id = (summary.user_id or "").encode("utf-8")
+            last_query = (summary.last_query or "").encode("utf-8")
+            flags = (_HAS_USER_ID if summary.user_id is not None else 0) | \
+                (_HAS_LAST_QUERY if summary.last_query is not None else 0)
+            try:
+                packed = _RECORD.pack(
+                    offset, len(body), record.size_bytes, record.last_access,
+                    summary.created_at.timestamp(), summary.last_updated.timestamp(), summary.message_count,
+                    flags, len(session_id), len(user_id), len(last_query)
+                )
+            except struct.error as e:
+                logger.warning("Leaving session %s out of the snapshot: %s", record.session_id, e)
+                continue
+
+            f.write(body)
+            index.append(packed + session_id + user_id + last_query)
+            offset += len(body)
+
+        f.write(b"".join(index))
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, len(index), offset))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+    return len(index)
+
+def read_snapshot(path: str) -> Iterator[SnapshotRecord]:
+    """
+    Yield the records of a snapshot file with lazily loaded bodies. The file stays mapped
+    for as long as any of its bodies is referenced.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, count, position = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a session snapshot")
+
+    for _ in range(count):
+        (
+            body_offset, body_length, size_bytes, last_access, created_at, last_updated,
+            message_count, flags, session_id_length, user_id_length, last_query_length
+        ) = _RECORD.unpack_from(buffer, position)
+        position += _RECORD.size
+
+        session_id = buffer[position:position + session_id_length].decode("utf-8")
+        position += session_id_length
+        user_id = buffer[position:position + user_id_length].decode("utf-8")
+        position += user_id_length
+        last_query = buffer[position:position + last_query_length].decode("utf-8")
+        position += last_query_length
+
+        summary = SessionSummary(
+            session_id=session_id,
+            user_id=user_id if flags & _HAS_USER_ID else None,
+            created_at=datetime.fromtimestamp(created_at),
+            last_updated=datetime.fromtimestamp(last_updated),
+            last_query=last_query if flags & _HAS_LAST_QUERY else None,
+            message_count=message_count
+        )
+        yield SnapshotRecord(session_id, LazyBody(buffer, body_offset, body_length), size_bytes, last_access, summary)
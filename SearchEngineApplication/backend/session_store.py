@@ -0,0 +1,561 @@
+import gc
+import os
+import time
+import json
+import asyncio
+import heapq
+import base64
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from models import ChatSession, SessionSummary
+from session_snapshot import LazyBody, SnapshotRecord, read_snapshot, write_snapshot
+from config import config
+from shared_state import get_shared_db
+from metrics import time_stage, active_sessions
+
+logger = logging.getLogger(__name__)
+
+def _dump_session(session: ChatSession) -> str:
+    with time_stage("serialization"):
+        return session.model_dump_json()
+
+def _load_session(data: str) -> ChatSession:
+    with time_stage("serialization"):
+        return ChatSession.model_validate_json(data)
+
+LAST_QUERY_MAX_CHARS = 200
+
+def summarize_session(session: ChatSession) -> SessionSummary:
+    """Build the listing projection of a session: identity, timestamps, last query and size"""
+    last_query = next(
+        (message.content for message in reversed(session.messages) if message.role == "user"),
+        session.search_query
+    )
+    if last_query and len(last_query) > LAST_QUERY_MAX_CHARS:
+        last_query = last_query[:LAST_QUERY_MAX_CHARS - 3] + "..."
+
+    return SessionSummary(
+        session_id=session.session_id,
+        user_id=session.user_id,
+        created_at=session.created_at,
+        last_updated=session.last_updated,
+        last_query=last_query,
+        message_count=len(session.messages)
+    )
+
+def _sort_key(summary: SessionSummary) -> Tuple[float, str]:
+    # Listings are ordered most recently updated first, with the session ID as tie-breaker
+    return summary.last_updated.timestamp(), summary.session_id
+
+def encode_cursor(summary: SessionSummary) -> str:
+    """Opaque cursor pointing just past the given summary"""
+    raw = json.dumps(list(_sort_key(summary))).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_updated, session_id = json.loads(raw)
+        return float(last_updated), str(session_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+class SessionStore(ABC):
+    """
+    Storage interface for chat sessions. Sessions are handed out as copies, so
+    callers must put() a session back after modifying it.
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """Return the session, or None if it does not exist or has expired"""
+
+    @abstractmethod
+    def put(self, session: ChatSession) -> None:
+        """Insert or replace a session"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Delete a session and return whether it existed"""
+
+    @abstractmethod
+    def list_sessions(self, user_id: Optional[str] = None) -> List[ChatSession]:
+        """Return all live sessions, optionally only those of one user"""
+
+    @abstractmethod
+    def list_summaries(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[SessionSummary], Optional[str]]:
+        """
+        Return one page of session summaries, most recently updated first, and the
+        cursor for the next page (None on the last page)
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Return the number of stored sessions"""
+
+    @abstractmethod
+    def stats(self) -> Dict:
+        """Return backend name, size and memory usage information"""
+
+    def snapshot(self, path: str) -> int:
+        """
+        Write all live sessions to a snapshot file and return how many were written.
+        Persistent backends have nothing to snapshot and write nothing.
+        """
+        return 0
+
+    def restore(self, path: str) -> int:
+        """Load sessions from a snapshot file written by snapshot() and return how many were restored"""
+        return 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def __len__(self) -> int:
+        return self.count()
+
+class InMemorySessionStore(SessionStore):
+    """
+    Process-local session store with idle TTL, LRU eviction and a memory budget
+    """
+
+    def __init__(self, max_sessions: int, ttl_seconds: float, max_memory_bytes: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        # session_id -> (serialized session, size in bytes, last access time, summary); sessions
+        # restored from a snapshot hold a LazyBody until first accessed
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        # user_id -> IDs of that user's sessions
+        self._user_index: Dict[str, Set[str]] = {}
+        self._memory_bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, session_id: str) -> None:
+        _, size_bytes, _, summary = self._sessions.pop(session_id)
+        self._memory_bytes -= size_bytes
+        if summary.user_id:
+            user_sessions = self._user_index.get(summary.user_id)
+            if user_sessions is not None:
+                user_sessions.discard(session_id)
+                if not user_sessions:
+                    del self._user_index[summary.user_id]
+
+    def _evict(self) -> None:
+        """Drop expired sessions, then least recently used ones until within budget"""
+        cutoff = time.time() - self.ttl_seconds
+        # The dict is kept in access order, so expired sessions sit at the front
+        while self._sessions:
+            oldest_id, (_, _, last_access, _) = next(iter(self._sessions.items()))
+            if last_access >= cutoff:
+                break
+            self._remove(oldest_id)
+            self._evictions += 1
+            logger.debug("Evicted expired session: %s", oldest_id)
+
+        while self._sessions and (
+            len(self._sessions) > self.max_sessions or self._memory_bytes > self.max_memory_bytes
+        ):
+            oldest_id = next(iter(self._sessions))
+            self._remove(oldest_id)
+            self._evictions += 1
+            logger.info("Evicted least recently used session: %s", oldest_id)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+
+            data, size_bytes, last_access, summary = entry
+            if last_access < time.time() - self.ttl_seconds:
+                self._remove(session_id)
+                self._evictions += 1
+                logger.debug("Session expired on access: %s", session_id)
+                return None
+
+            if isinstance(data, LazyBody):
+                data = data.load()
+            self._sessions[session_id] = (data, size_bytes, time.time(), summary)
+            self._sessions.move_to_end(session_id)
+
+        return _load_session(data)
+
+    def put(self, session: ChatSession) -> None:
+        data = _dump_session(session)
+        size_bytes = len(data)
+        summary = summarize_session(session)
+        with self._lock:
+            if session.session_id in self._sessions:
+                self._remove(session.session_id)
+            self._sessions[session.session_id] = (data, size_bytes, time.time(), summary)
+            self._memory_bytes += size_bytes
+            if session.user_id:
+                self._user_index.setdefault(session.user_id, set()).add(session.session_id)
+            self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def list_sessions(self, user_id: Optional[str] = None) -> List[ChatSession]:
+        with self._lock:
+            self._evict()
+            if user_id:
+                payloads = [self._sessions[session_id][0] for session_id in self._user_index.get(user_id, ())]
+            else:
+                payloads = [entry[0] for entry in self._sessions.values()]
+
+        return [_load_session(data.load() if isinstance(data, LazyBody) else data) for data in payloads]
+
+    def list_summaries(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[SessionSummary], Optional[str]]:
+        after = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            self._evict()
+            if user_id:
+                summaries = [self._sessions[session_id][3] for session_id in self._user_index.get(user_id, ())]
+            else:
+                summaries = [entry[3] for entry in self._sessions.values()]
+
+        if after is not None:
+            summaries = [summary for summary in summaries if _sort_key(summary) < after]
+
+        # Summaries are precomputed on put(), so a page never deserializes a session
+        page = heapq.nlargest(limit + 1, summaries, key=_sort_key)
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return page[:limit], next_cursor
+
+    def snapshot(self, path: str) -> int:
+        with self._lock:
+            self._evict()
+            # Entries are immutable tuples, so compression can run outside the lock
+            records = [
+                SnapshotRecord(session_id, data, size_bytes, last_access, summary)
+                for session_id, (data, size_bytes, last_access, summary) in self._sessions.items()
+            ]
+        return write_snapshot(path, records)
+
+    def restore(self, path: str) -> int:
+        cutoff = time.time() - self.ttl_seconds
+        restored = 0
+        # Bulk-loading hundreds of thousands of entries would otherwise trigger repeated full
+        # garbage collections, and none of the restored objects are cyclic garbage
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with self._lock:
+                # Records are in least-recently-used-first order, matching the dict
+                for record in read_snapshot(path):
+                    if record.last_access < cutoff or record.session_id in self._sessions:
+                        continue
+                    self._sessions[record.session_id] = (record.data, record.size_bytes, record.last_access, record.summary)
+                    self._memory_bytes += record.size_bytes
+                    if record.summary.user_id:
+                        self._user_index.setdefault(record.summary.user_id, set()).add(record.session_id)
+                    restored += 1
+                self._evict()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return restored
+
+    def count(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "memory_bytes": self._memory_bytes,
+            "max_memory_bytes": self.max_memory_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self._evictions
+        }
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store persisted in a local SQLite database with idle TTL and a size cap.
+    The WAL-mode database can be shared by all uvicorn/gunicorn worker processes.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_sessions: int,
+        ttl_seconds: float,
+        evict_every_puts: int = 100,
+        access_refresh_seconds: float = 30
+    ):
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.evict_every_puts = max(evict_every_puts, 1)
+        self.access_refresh_seconds = access_refresh_seconds
+        self._evictions = 0
+        # Start due so the first write also clears whatever expired while the process was down
+        self._puts_since_evict = self.evict_every_puts
+
+        # The database may be shared by several worker processes
+        self._db = get_shared_db(db_path)
+        self._db.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chat_sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                data TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                created_at REAL,
+                last_updated REAL,
+                last_query TEXT,
+                message_count INTEGER
+            )
+            """
+        )
+        self._migrate_summary_columns()
+        self._db.conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_access ON chat_sessions (last_access)")
+        self._db.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (last_updated, session_id)"
+        )
+        self._db.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_updated ON chat_sessions (user_id, last_updated, session_id)"
+        )
+        logger.info("SQLite session store opened at %s", db_path)
+
+    def _migrate_summary_columns(self) -> None:
+        """Add and backfill the summary columns in databases created before they existed"""
+        columns = {row[1] for row in self._db.conn.execute("PRAGMA table_info(chat_sessions)")}
+        for name, declaration in (
+            ("created_at", "REAL"), ("last_updated", "REAL"), ("last_query", "TEXT"), ("message_count", "INTEGER")
+        ):
+            if name not in columns:
+                try:
+                    self._db.conn.execute(f"ALTER TABLE chat_sessions ADD COLUMN {name} {declaration}")
+                except sqlite3.OperationalError:
+                    pass  # Added concurrently by another worker
+
+        rows = self._db.conn.execute("SELECT data FROM chat_sessions WHERE last_updated IS NULL").fetchall()
+        for (data,) in rows:
+            summary = summarize_session(_load_session(data))
+            self._db.conn.execute(
+                "UPDATE chat_sessions SET created_at = ?, last_updated = ?, last_query = ?, message_count = ? "
+                "WHERE session_id = ?",
+                (summary.created_at.timestamp(), summary.last_updated.timestamp(), summary.last_query,
+                 summary.message_count, summary.session_id)
+            )
+        if rows:
+            logger.info("Backfilled listing summaries for %s stored sessions", len(rows))
+
+    def _evict(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = self._db.conn.execute("DELETE FROM chat_sessions WHERE last_access < ?", (cutoff,)).rowcount
+
+        overflow = self._db.conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            self._db.conn.execute(
+                """
+                DELETE FROM chat_sessions WHERE session_id IN (
+                    SELECT session_id FROM chat_sessions ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (overflow,)
+            )
+            logger.info("Evicted %s least recently used sessions", overflow)
+
+        self._evictions += max(expired, 0) + max(overflow, 0)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        with self._db.lock:
+            row = self._db.conn.execute(
+                "SELECT data, last_access FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            data, last_access = row
+            if last_access < time.time() - self.ttl_seconds:
+                self._db.conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                self._evictions += 1
+                logger.debug("Session expired on access: %s", session_id)
+                return None
+
+            # The idle TTL is far longer than the refresh interval, so most reads stay read-only
+            now = time.time()
+            if now - last_access >= self.access_refresh_seconds:
+                self._db.conn.execute(
+                    "UPDATE chat_sessions SET last_access = ? WHERE session_id = ?", (now, session_id)
+                )
+
+        return _load_session(data)
+
+    def put(self, session: ChatSession) -> None:
+        data = _dump_session(session)
+        summary = summarize_session(session)
+        with self._db.lock:
+            self._db.conn.execute(
+                "INSERT OR REPLACE INTO chat_sessions (session_id, user_id, data, size_bytes, last_access, "
+                "created_at, last_updated, last_query, message_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (session.session_id, session.user_id, data, len(data), time.time(),
+                 summary.created_at.timestamp(), summary.last_updated.timestamp(), summary.last_query,
+                 summary.message_count)
+            )
+            # Counting the table is a full scan, so the limits are only enforced periodically;
+            # between passes the store may briefly hold up to evict_every_puts extra sessions
+            # per worker, and reads already treat expired rows as missing
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self.evict_every_puts:
+                self._puts_since_evict = 0
+                self._evict()
+
+    def delete(self, session_id: str) -> bool:
+        with self._db.lock:
+            cursor = self._db.conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            return cursor.rowcount > 0
+
+    def list_sessions(self, user_id: Optional[str] = None) -> List[ChatSession]:
+        cutoff = time.time() - self.ttl_seconds
+        with self._db.lock:
+            if user_id:
+                rows = self._db.conn.execute(
+                    "SELECT data FROM chat_sessions WHERE user_id = ? AND last_access >= ?", (user_id, cutoff)
+                ).fetchall()
+            else:
+                rows = self._db.conn.execute(
+                    "SELECT data FROM chat_sessions WHERE last_access >= ?", (cutoff,)
+                ).fetchall()
+
+        return [_load_session(data) for (data,) in rows]
+
+    def list_summaries(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[SessionSummary], Optional[str]]:
+        clauses = ["last_access >= ?"]
+        params: list = [time.time() - self.ttl_seconds]
+        if user_id:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if cursor:
+            clauses.append("(last_updated, session_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        # Served from the (user_id, last_updated, session_id) indexes without reading session data
+        with self._db.lock:
+            rows = self._db.conn.execute(
+                "SELECT session_id, user_id, created_at, last_updated, last_query, message_count "
+                f"FROM chat_sessions WHERE {' AND '.join(clauses)} "
+                "ORDER BY last_updated DESC, session_id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        page = [
+            SessionSummary(
+                session_id=session_id,
+                user_id=row_user_id,
+                created_at=datetime.fromtimestamp(created_at),
+                last_updated=datetime.fromtimestamp(last_updated),
+                last_query=last_query,
+                message_count=message_count
+            )
+            for session_id, row_user_id, created_at, last_updated, last_query, message_count in rows
+        ]
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        return page[:limit], next_cursor
+
+    def count(self) -> int:
+        with self._db.lock:
+            return self._db.conn.execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def stats(self) -> Dict:
+        with self._db.lock:
+            sessions, data_bytes = self._db.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM chat_sessions"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "db_path": self.db_path,
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "memory_bytes": data_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "evictions": self._evictions
+        }
+
+def create_session_store() -> SessionStore:
+    """Create the session store selected by SESSION_STORE_BACKEND"""
+    backend = config.SESSION_STORE_BACKEND.lower()
+
+    if backend == "sqlite":
+        return SQLiteSessionStore(
+            db_path=config.SESSION_DB_PATH,
+            max_sessions=config.SESSION_MAX_COUNT,
+            ttl_seconds=config.SESSION_TTL_SECONDS,
+            evict_every_puts=config.SESSION_EVICT_EVERY_PUTS,
+            access_refresh_seconds=config.SHARED_STATE_ACCESS_REFRESH_SECONDS
+        )
+
+    if backend != "memory":
+        logger.warning("Unknown session store backend '%s', falling back to in-memory store", backend)
+
+    return InMemorySessionStore(
+        max_sessions=config.SESSION_MAX_COUNT,
+        ttl_seconds=config.SESSION_TTL_SECONDS,
+        max_memory_bytes=config.SESSION_MAX_MEMORY_MB * 1024 * 1024
+    )
+
+session_store = create_session_store()
+active_sessions.set_function(session_store.count)
+
+def restore_sessions(path: str) -> int:
+    """Restore the session store from a snapshot file, if one exists"""
+    if not os.path.exists(path):
+        logger.info("No session snapshot at %s", path)
+        return 0
+
+    start = time.perf_counter()
+    try:
+        restored = session_store.restore(path)
+    except Exception as e:
+        logger.error("Failed to restore sessions from %s: %s", path, e)
+        return 0
+    logger.info("Restored %s sessions from %s in %.2fs", restored, path, time.perf_counter() - start)
+    return restored
+
+def snapshot_sessions(path: str) -> int:
+    """Write the session store to a snapshot file, logging rather than raising on failure"""
+    start = time.perf_counter()
+    try:
+        written = session_store.snapshot(path)
+    except Exception as e:
+        logger.error("Failed to snapshot sessions to %s: %s", path, e)
+        return 0
+    logger.info("Snapshotted %s sessions to %s in %.2fs", written, path, time.perf_counter() - start)
+    return written
+
+async def snapshot_periodically(path: str, interval_seconds: float) -> None:
+    """Snapshot the session store every interval_seconds, off the event loop"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await asyncio.to_thread(snapshot_sessions, path)
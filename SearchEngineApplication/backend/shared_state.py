@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class SharedSQLite:
+    """
+    Fork-safe handle on a local SQLite database in WAL mode shared by all worker processes.
+
+    Connections are opened lazily and per process, so the handle can be created while the
+    app is preloaded in the master process and used after the workers are forked.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _check_process(self) -> None:
+        # A forked child must not reuse the parent's connection or lock state
+        if self._pid != os.getpid():
+            self._conn = None
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+
+    @property
+    def lock(self) -> threading.Lock:
+        """Lock serializing use of this process's connection across threads"""
+        self._check_process()
+        return self._lock
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Return this process's connection, opening it on first use"""
+        self._check_process()
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            logger.info("Opened shared SQLite database %s in process %s", self.db_path, self._pid)
+        return self._conn
+
+_databases: Dict[str, SharedSQLite] = {}
+
+def get_shared_db(db_path: str) -> SharedSQLite:
+    """Return the process-wide handle for a database file, creating it on first use"""
+    if db_path not in _databases:
+        _databases[db_path] = SharedSQLite(db_path)
+    return _databases[db_path]
@@ -0,0 +1,65 @@
+import json
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from config import config
+from logging_config import queued
+from tracing import Trace
+
+logger = logging.getLogger(__name__)
+
+# Endpoints whose slow requests are recorded
+SLOW_QUERY_PATHS = {"/search", "/chat/start", "/chat/message", "/chat/ws"}
+
+# Slow requests are written one JSON object per line through a dedicated logger, like the
+# query log and trace export
+_slow_logger = logging.getLogger("slow_query_log")
+_slow_logger.propagate = False
+_slow_logger.setLevel(logging.INFO)
+
+if config.SLOW_QUERY_LOG_PATH:
+    if config.WORKERS > 1:
+        # Worker processes rotating one shared file would rename it under each other, so
+        # they only append and rotation is left to an external tool such as logrotate;
+        # WatchedFileHandler reopens the file once it has been moved away
+        _handler = logging.handlers.WatchedFileHandler(config.SLOW_QUERY_LOG_PATH)
+    else:
+        _handler = logging.handlers.RotatingFileHandler(
+            config.SLOW_QUERY_LOG_PATH,
+            maxBytes=config.SLOW_QUERY_LOG_MAX_BYTES,
+            backupCount=config.SLOW_QUERY_LOG_BACKUPS
+        )
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _slow_logger.addHandler(queued(_handler))
+
+def record_if_slow(trace: Trace, path: str) -> bool:
+    """
+    Append the request's context and per-stage durations to the slow-query log if it
+    is a search/chat request that took longer than SLOW_QUERY_THRESHOLD_MS
+    """
+    if not config.SLOW_QUERY_LOG_PATH or path not in SLOW_QUERY_PATHS or trace.duration is None:
+        return False
+
+    duration_ms = trace.duration * 1000
+    if duration_ms < config.SLOW_QUERY_THRESHOLD_MS:
+        return False
+
+    attributes = dict(trace.attributes)
+    entry = {
+        "timestamp": datetime.fromtimestamp(trace.started_at, tz=timezone.utc).isoformat(timespec="milliseconds"),
+        "request_id": trace.request_id,
+        "endpoint": path,
+        "status": attributes.pop("status", None),
+        "duration_ms": round(duration_ms, 1),
+        "query": attributes.pop("query", None),
+        "rewritten_query": attributes.pop("rewritten_query", None),
+        "brand_filter": attributes.pop("brand_filter", None),
+        "color_filter": attributes.pop("color_filter", None),
+        "result_count": attributes.pop("result_count", None),
+        "retries": attributes.pop("retries", 0),
+        "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in trace.stage_durations().items()},
+        **attributes
+    }
+    _slow_logger.info(json.dumps(entry, default=str, ensure_ascii=False))
+    logger.warning("Slow %s request %s took %.0f ms", path, trace.request_id, duration_ms)
+    return True
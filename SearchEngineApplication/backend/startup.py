@@ -0,0 +1,65 @@
+import sys
+import time
+import asyncio
+import logging
+from typing import Optional
+from config import config
+from readiness import readiness
+
+logger = logging.getLogger(__name__)
+
+def _connect_and_warm_up() -> Optional[str]:
+    # Importing weaviate_client creates the singleton, which opens the connection; a failed
+    # import is not cached, so the next attempt connects again
+    from weaviate_client import weaviate_client
+    return weaviate_client.warm_up()
+
+async def start_weaviate() -> bool:
+    """
+    Connect to Weaviate, check the products collection and run a warm-up query, retrying
+    with backoff until it succeeds. Marks the weaviate readiness component and returns
+    whether Weaviate came up.
+    """
+    delay = config.WEAVIATE_STARTUP_RETRY_SECONDS
+    attempt = 0
+    while True:
+        attempt += 1
+        start_time = time.time()
+        try:
+            # A schema gap the backend can work around is reported, not retried
+            note = await asyncio.to_thread(_connect_and_warm_up)
+            detail = f"connected and warmed up in {time.time() - start_time:.2f}s"
+            readiness.mark("weaviate", True, f"{detail}; {note}" if note else detail)
+            return True
+
+        except asyncio.CancelledError:
+            logger.info("Weaviate startup cancelled")
+            raise
+        except ValueError as e:
+            # Missing configuration will not fix itself, so stop retrying
+            logger.error("Weaviate is not configured: %s", e)
+            readiness.mark("weaviate", False, f"not configured: {str(e)}")
+            return False
+        except Exception as e:
+            logger.error("Weaviate startup attempt %s failed: %s; retrying in %.1fs", attempt, e, delay)
+            readiness.mark("weaviate", False, f"attempt {attempt} failed: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+async def warm_up_backend() -> None:
+    """Bring Weaviate up, then prewarm the caches through it when prewarming is enabled"""
+    weaviate_ready = await start_weaviate()
+
+    if config.PREWARM_ENABLED:
+        from prewarm import prewarm_caches
+        if weaviate_ready:
+            await prewarm_caches()
+        else:
+            readiness.mark("prewarm", True, "skipped: Weaviate unavailable")
+
+def close_weaviate() -> None:
+    """Close the Weaviate connection if one was opened, without connecting just to close it"""
+    module = sys.modules.get("weaviate_client")
+    if module is not None:
+        module.weaviate_client.close()
+        logger.info("Weaviate connection closed")
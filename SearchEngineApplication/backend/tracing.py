@@ -0,0 +1,168 @@
+import re
+import json
+import time
+import uuid
+import asyncio
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+from config import config
+from logging_config import queued
+
+logger = logging.getLogger(__name__)
+
+# Finished traces are written one JSON object per line through a dedicated logger,
+# the same way the query log is written
+_trace_logger = logging.getLogger("trace_export")
+_trace_logger.propagate = False
+_trace_logger.setLevel(logging.INFO)
+
+if config.TRACE_EXPORT_PATH:
+    _handler = logging.FileHandler(config.TRACE_EXPORT_PATH)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    _trace_logger.addHandler(queued(_handler))
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+
+class Trace:
+    """
+    Spans recorded while handling one request. Spans are shared across the tasks and
+    threads the request fans out to, since contextvars are copied into them.
+    """
+
+    def __init__(self, request_id: str, name: str):
+        self.request_id = request_id
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Span] = []
+        self.attributes: Dict = {}
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+    def stage_durations(self) -> Dict[str, float]:
+        """Total seconds spent in each span name, in first-seen order"""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            if span.duration is not None:
+                totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def server_timing(self) -> str:
+        """Render the Server-Timing header value, with durations in milliseconds"""
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in self.stage_durations().items()]
+        if self.duration is not None:
+            entries.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict:
+        span_ids = {id(span): index for index, span in enumerate(self.spans)}
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round((self.duration or 0.0) * 1000, 2),
+            "attributes": self.attributes,
+            "spans": [
+                {
+                    "id": index,
+                    "parent": span_ids.get(id(span.parent)) if span.parent else None,
+                    "name": span.name,
+                    "offset_ms": round((span.start - self.start) * 1000, 2),
+                    "duration_ms": round((span.duration or 0.0) * 1000, 2),
+                    "attributes": span.attributes,
+                    "error": span.error
+                }
+                for index, span in enumerate(self.spans)
+            ]
+        }
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Reuse a well-formed incoming X-Request-ID, otherwise generate one"""
+    if incoming and _REQUEST_ID.match(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+def start_trace(request_id: str, name: str) -> Trace:
+    """Start a trace and make it current for this context"""
+    trace = Trace(request_id, name)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """Record a span in the current trace; a no-op outside of a traced request"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    trace.spans.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+
+def annotate(**attributes) -> None:
+    """Attach request-level attributes (query, filters, result count...) to the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes.update(attributes)
+
+def increment(name: str, amount: int = 1) -> None:
+    """Add to a request-level counter attribute on the current trace"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.attributes[name] = trace.attributes.get(name, 0) + amount
+
+def traced(name: str):
+    """Decorator recording a span around a sync or async function"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def export_trace(trace: Trace) -> None:
+    """Append a finished trace to TRACE_EXPORT_PATH as one JSON line, if configured"""
+    if config.TRACE_EXPORT_PATH:
+        _trace_logger.info(json.dumps(trace.to_dict(), default=str))
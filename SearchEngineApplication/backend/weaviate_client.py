@@ -6,9 +6,30 @@ import weaviate.classes.query as wvcq
 from typing import List, Dict, Optional
 import time
 from config import config
+from metrics import time_stage, retries, reconnects, fallbacks
+from tracing import traced, increment
 
 logger = logging.getLogger(__name__)
 
+COLLECTION_NAME = "EcommerceProducts"
+SUMMARY_PROPERTY = "product_summary"
+
+def transform_product_properties(product_props: Dict) -> Dict:
+    """Map Weaviate product properties to the product dict shape used by the API"""
+    return {
+        "id": product_props.get("product_id", ""),
+        "title": product_props.get("product_title", ""),
+        "brand": product_props.get("product_brand", ""),
+        "color": product_props.get("product_color", ""),
+        "description": product_props.get("product_description", ""),
+        "bullet_points": product_props.get("product_bullet_point", ""),
+        "summary": product_props.get("product_summary", ""),
+        "price": "Price not available",  # Not available in current schema
+        "image_url": "",  # Not available in current schema
+        "rating": 0,  # Not available in current schema
+        "reviews": 0  # Not available in current schema
+    }
+
 class WeaviateClientSingleton:
     _instance: Optional['WeaviateClientSingleton'] = None
     _client: Optional[weaviate.WeaviateClient] = None
@@ -17,6 +38,8 @@ class WeaviateClientSingleton:
     _health_check_interval: float = 300  # 5 minutes
     _connection_timeout: int = 60  # 60 seconds timeout
     _max_retries: int = 3
+    # Whether the collection has product_summary; read from its schema once per client, on first use
+    _summary_available: Optional[bool] = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -71,13 +94,14 @@ class WeaviateClientSingleton:
 
             if self._client.is_ready():
                 self._initialized = True
+                self._summary_available = None  # The new client may see a different schema
                 self._last_health_check = time.time()
                 logger.info("Weaviate client v4 initialized successfully with robust connection settings")
             else:
                 raise ConnectionError("Weaviate client not ready")
 
         except Exception as e:
-            logger.error(f"Failed to initialize Weaviate client: {str(e)}")
+            logger.error("Failed to initialize Weaviate client: %s", e)
             self._client = None
             self._initialized = False
             raise
@@ -106,20 +130,21 @@ class WeaviateClientSingleton:
             return True
 
         except Exception as e:
-            logger.error(f"Weaviate health check error: {str(e)}")
+            logger.error("Weaviate health check error: %s", e)
             return False
 
     def _reconnect_if_needed(self) -> None:
         """Reconnect if the connection is unhealthy"""
         if not self._check_connection_health():
             logger.info("Attempting to reconnect to Weaviate...")
+            reconnects.inc(component="weaviate")
 
             # Close existing connection if it exists
             if self._client:
                 try:
                     self._client.close()
                 except Exception as e:
-                    logger.warning(f"Error closing old connection: {str(e)}")
+                    logger.warning("Error closing old connection: %s", e)
 
             # Reset state
             self._client = None
@@ -128,7 +153,7 @@ class WeaviateClientSingleton:
             # Retry connection
             for attempt in range(self._max_retries):
                 try:
-                    logger.info(f"Reconnection attempt {attempt + 1}/{self._max_retries}")
+                    logger.info("Reconnection attempt %s/%s", attempt + 1, self._max_retries)
                     self._create_connection()
 
                     if self._initialized:
@@ -136,7 +161,7 @@ class WeaviateClientSingleton:
                         return
 
                 except Exception as e:
-                    logger.error(f"Reconnection attempt {attempt + 1} failed: {str(e)}")
+                    logger.error("Reconnection attempt %s failed: %s", attempt + 1, e)
                     if attempt < self._max_retries - 1:
                         time.sleep(2 ** attempt)  # Exponential backoff
 
@@ -153,6 +178,63 @@ class WeaviateClientSingleton:
 
         return self._client
 
+    def warm_up(self) -> Optional[str]:
+        """
+        Verify that the products collection exists and run one small query, so the gRPC
+        channel is open before the first search arrives. Returns a note describing any
+        schema gap the backend is working around, or None.
+        """
+        client = self.client
+        if not client.collections.exists(COLLECTION_NAME):
+            raise RuntimeError(f"Weaviate collection '{COLLECTION_NAME}' does not exist")
+
+        note = None
+        if config.USE_PRODUCT_SUMMARY and not self._has_summary_property():
+            note = "product_summary missing, serving full descriptions (run enrichment.py --backfill)"
+
+        with time_stage("weaviate_warm_up"):
+            client.collections.get(COLLECTION_NAME).query.fetch_objects(
+                limit=1,
+                return_properties=self._search_properties()
+            )
+        return note
+
+    def close(self) -> None:
+        if self._client:
+            try:
+                self._client.close()
+            except Exception as e:
+                logger.warning("Error closing Weaviate connection: %s", e)
+        self._client = None
+        self._initialized = False
+
+    def _has_summary_property(self) -> bool:
+        """Whether the collection has product_summary, checked against its schema once per client"""
+        if self._summary_available is None:
+            try:
+                schema = self.client.collections.get(COLLECTION_NAME).config.get()
+                self._summary_available = SUMMARY_PROPERTY in {prop.name for prop in schema.properties}
+            except Exception as e:
+                # Cached like a missing property, so a failing lookup is not retried on every search
+                logger.warning("Could not read the schema of collection '%s': %s", COLLECTION_NAME, e)
+                self._summary_available = False
+                return False
+            if not self._summary_available:
+                logger.warning(
+                    "Collection '%s' has no %s property; searches return full descriptions until "
+                    "Data_Ingestion/enrichment.py --backfill has been run",
+                    COLLECTION_NAME, SUMMARY_PROPERTY
+                )
+        return self._summary_available
+
+    def _search_properties(self) -> Optional[List[str]]:
+        """Properties to return from searches; None returns every property"""
+        if config.USE_PRODUCT_SUMMARY and self._has_summary_property():
+            # The compact summary replaces the long description and bullet point fields
+            return ["product_id", "product_title", "product_brand", "product_color", SUMMARY_PROPERTY]
+        return None
+
+    @traced("weaviate_search")
     def semantic_search(
         self,
         query: str,
@@ -165,69 +247,57 @@ class WeaviateClientSingleton:
         """
         for attempt in range(self._max_retries):
             try:
-                logger.info(f"Performing semantic search for: '{query}' (limit: {limit}) - Attempt {attempt + 1}")
+                logger.info("Performing semantic search for: '%s' (limit: %s) - Attempt %s", query, limit, attempt + 1)
 
                 # Get the collection - this will auto-reconnect if needed
-                ecommerce_products = self.client.collections.get("EcommerceProducts")
+                ecommerce_products = self.client.collections.get(COLLECTION_NAME)
 
                 # Build filters using the exact syntax from your notebook
                 filters = []
                 if brand_filter:
                     filters.append(("product_brand", brand_filter))
-                    logger.debug(f"Added brand filter: {brand_filter}")
+                    logger.debug("Added brand filter: %s", brand_filter)
                 if color_filter and color_filter.strip():
                     filters.append(("product_color", color_filter))
-                    logger.debug(f"Added color filter: {color_filter}")
+                    logger.debug("Added color filter: %s", color_filter)
 
                 # Perform the query using v4 API matching your notebook
-                if filters:
-                    # Use the exact syntax from your notebook
-                    result = ecommerce_products.query.near_text(
-                        query=query,
-                        limit=limit,
-                        filters=wvcq.Filter.all_of([wvcq.Filter.by_property(filter[0]).equal(filter[1]) for filter in filters]),
-                        return_metadata=MetadataQuery(score=True)
-                    )
-                    logger.debug(f"Query with filters: {filters}")
-                else:
-                    # Query without filters
-                    result = ecommerce_products.query.near_text(
-                        query=query,
-                        limit=limit,
-                        return_metadata=MetadataQuery(score=True)
-                    )
+                with time_stage("weaviate_query"):
+                    if filters:
+                        # Use the exact syntax from your notebook
+                        result = ecommerce_products.query.near_text(
+                            query=query,
+                            limit=limit,
+                            filters=wvcq.Filter.all_of([wvcq.Filter.by_property(filter[0]).equal(filter[1]) for filter in filters]),
+                            return_metadata=MetadataQuery(score=True),
+                            return_properties=self._search_properties()
+                        )
+                        logger.debug("Query with filters: %s", filters)
+                    else:
+                        # Query without filters
+                        result = ecommerce_products.query.near_text(
+                            query=query,
+                            limit=limit,
+                            return_metadata=MetadataQuery(score=True),
+                            return_properties=self._search_properties()
+                        )
 
                 if not result.objects:
-                    logger.warning(f"No results found in Weaviate for query: '{query}' with filters: brand={brand_filter}, color={color_filter}")
+                    logger.warning("No results found in Weaviate for query: '%s' with filters: brand=%s, color=%s", query, brand_filter, color_filter)
                     return []
 
                 products = result.objects
-                logger.info(f"Found {len(products)} products for query: '{query}' with filters: brand={brand_filter}, color={color_filter}")
+                logger.info("Found %s products for query: '%s' with filters: brand=%s, color=%s", len(products), query, brand_filter, color_filter)
 
                 # Transform the results to match expected format
-                transformed_products = []
-                for obj in products:
-                    product_props = obj.properties
-                    transformed_product = {
-                        "id": product_props.get("product_id", ""),
-                        "title": product_props.get("product_title", ""),
-                        "brand": product_props.get("product_brand", ""),
-                        "color": product_props.get("product_color", ""),
-                        "description": product_props.get("product_description", ""),
-                        "bullet_points": product_props.get("product_bullet_point", ""),
-                        "price": "Price not available",  # Not available in current schema
-                        "image_url": "",  # Not available in current schema
-                        "rating": 0,  # Not available in current schema
-                        "reviews": 0  # Not available in current schema
-                    }
-                    transformed_products.append(transformed_product)
-
-                return transformed_products
+                return [transform_product_properties(obj.properties) for obj in products]
 
             except (ConnectionError, TimeoutError, Exception) as e:
-                logger.error(f"Error performing semantic search (attempt {attempt + 1}): {str(e)}")
+                logger.error("Error performing semantic search (attempt %s): %s", attempt + 1, e)
 
                 if attempt < self._max_retries - 1:
+                    retries.inc(component="weaviate", reason="search_error")
+                    increment("retries")
                     # Force reconnection on next attempt
                     self._last_health_check = 0
                     time.sleep(2 ** attempt)  # Exponential backoff
@@ -243,7 +313,7 @@ class WeaviateClientSingleton:
         # Skip aggregate entirely - go straight to HTTP REST fetch
         try:
             logger.info("Fetching available brands using HTTP REST fetch method")
-            ecommerce_products = self.client.collections.get("EcommerceProducts")
+            ecommerce_products = self.client.collections.get(COLLECTION_NAME)
 
             # Fetch large sample to get comprehensive brand list
             result = ecommerce_products.query.fetch_objects(
@@ -261,15 +331,16 @@ class WeaviateClientSingleton:
             # Sort by frequency (most frequent first)
             brand_list = sorted(brand_counts.items(), key=lambda x: x[1], reverse=True)
             brand_list = [brand for brand, count in brand_list[:limit]]
-            logger.info(f"HTTP REST method successful: Found {len(brand_list)} unique brands")
+            logger.info("HTTP REST method successful: Found %s unique brands", len(brand_list))
             return brand_list
 
         except Exception as e:
-            logger.error(f"HTTP REST fetch failed: {str(e)}")
+            logger.error("HTTP REST fetch failed: %s", e)
             # Return hardcoded brands as fallback
             fallback_brands = ["Apple", "Dell", "HP", "Lenovo", "ASUS", "Acer", "Samsung", "Microsoft", "Sony", "LG",
                              "Canon", "Nikon", "Nike", "Adidas", "Amazon", "Google", "Intel", "AMD", "NVIDIA", "Tesla"]
-            logger.info(f"Using hardcoded fallback brands: {len(fallback_brands)} brands")
+            logger.info("Using hardcoded fallback brands: %s brands", len(fallback_brands))
+            fallbacks.inc(kind="brands")
             return fallback_brands[:limit]
 
     def get_available_colors(self, limit: int = 50) -> List[str]:
@@ -279,7 +350,7 @@ class WeaviateClientSingleton:
         # Skip aggregate entirely - go straight to HTTP REST fetch
         try:
             logger.info("Fetching available colors using HTTP REST fetch method")
-            ecommerce_products = self.client.collections.get("EcommerceProducts")
+            ecommerce_products = self.client.collections.get(COLLECTION_NAME)
 
             # Fetch large sample to get comprehensive color list
             result = ecommerce_products.query.fetch_objects(
@@ -297,15 +368,16 @@ class WeaviateClientSingleton:
             # Sort by frequency (most frequent first)
             color_list = sorted(color_counts.items(), key=lambda x: x[1], reverse=True)
             color_list = [color for color, count in color_list[:limit]]
-            logger.info(f"HTTP REST method successful: Found {len(color_list)} unique colors")
+            logger.info("HTTP REST method successful: Found %s unique colors", len(color_list))
             return color_list
 
         except Exception as e:
-            logger.error(f"HTTP REST fetch failed: {str(e)}")
+            logger.error("HTTP REST fetch failed: %s", e)
             # Return hardcoded colors as fallback
             fallback_colors = ["Black", "White", "Gray", "Silver", "Blue", "Red", "Green", "Gold", "Pink", "Purple",
                              "Yellow", "Orange", "Brown", "Navy", "Beige", "Tan", "Maroon", "Teal", "Olive", "Coral"]
-            logger.info(f"Using hardcoded fallback colors: {len(fallback_colors)} colors")
+            logger.info("Using hardcoded fallback colors: %s colors", len(fallback_colors))
+            fallbacks.inc(kind="colors")
             return fallback_colors[:limit]
 
 weaviate_client = WeaviateClientSingleton()
\ No newline at end of file
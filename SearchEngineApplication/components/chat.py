@@ -1,7 +1,7 @@
 import streamlit as st
 import time
 import logging
-from utils import send_chat_message
+from utils import stream_chat_message, rerun_fragment
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +17,15 @@ def simulate_streaming_response(text: str, placeholder) -> None:
 
     placeholder.markdown(displayed_text.strip())
 
+def _product_ids() -> tuple:
+    return tuple(product.get("id") for product in st.session_state.products)
+
+@st.fragment
 def render_chat_interface(session_id: str = None) -> None:
-    """Render the complete chat interface"""
+    """
+    Render the complete chat interface. Sending a message reruns only this fragment,
+    unless the turn's fresh search changed the products shown in the results grid.
+    """
     logger.info("Rendering chat interface")
 
     st.markdown("#### 💬 AI Assistant")
@@ -93,19 +100,31 @@ def render_chat_interface(session_id: str = None) -> None:
             with chat_container:
                 with st.chat_message("assistant"):
                     st.markdown(error_message)
-            st.rerun()
+            rerun_fragment()
             return
 
+        products_before = _product_ids()
         try:
             # Get active filters from session state
             active_brand = getattr(st.session_state, 'active_brand_filter', None)
             active_color = getattr(st.session_state, 'active_color_filter', None)
 
+            with chat_container:
+                with st.chat_message("assistant"):
+                    response_placeholder = st.empty()
+
+            streamed_text = []
+
+            def render_token(delta: str) -> None:
+                streamed_text.append(delta)
+                response_placeholder.markdown("".join(streamed_text) + "▌")
+
             with st.spinner("🤖 Getting AI response..."):
                 # Send chat message with current filters - this will trigger fresh search
-                chat_response = send_chat_message(
+                chat_response = stream_chat_message(
                     session_id,
                     prompt,
+                    render_token,
                     brand_filter=active_brand,
                     color_filter=active_color
                 )
@@ -114,18 +133,22 @@ def render_chat_interface(session_id: str = None) -> None:
                 assistant_content = chat_response["assistant_response"]["content"]
                 logger.info(f"Received assistant response (length: {len(assistant_content)})")
 
-                with chat_container:
-                    with st.chat_message("assistant"):
-                        response_placeholder = st.empty()
-                        simulate_streaming_response(assistant_content, response_placeholder)
+                if streamed_text:
+                    response_placeholder.markdown(assistant_content)
+                else:
+                    # Sent over HTTP: the reply arrived in one piece
+                    simulate_streaming_response(assistant_content, response_placeholder)
 
                 st.session_state.messages.append({"role": "assistant", "content": assistant_content})
 
-                # Update search results with new products from the fresh search
-                # Get updated products from the session after the message processing
+                # Update search results with new products from the fresh search; the socket
+                # delivers them with the reply, over HTTP they are fetched from the session
                 try:
-                    from utils import get_session_products
-                    updated_results = get_session_products(session_id)
+                    if "products" in chat_response:
+                        updated_results = {"products": chat_response["products"]}
+                    else:
+                        from utils import get_session_products
+                        updated_results = get_session_products(session_id)
                     if updated_results and updated_results.get("products"):
                         st.session_state.products = updated_results["products"]
                         logger.info(f"Updated search results with {len(updated_results['products'])} products")
@@ -148,9 +171,7 @@ def render_chat_interface(session_id: str = None) -> None:
                 error_message = "❌ I'm having trouble connecting to the AI service. Please check the backend server and try again."
                 logger.error("Failed to get assistant response")
 
-                with chat_container:
-                    with st.chat_message("assistant"):
-                        st.markdown(error_message)
+                response_placeholder.markdown(error_message)
 
                 st.session_state.messages.append({"role": "assistant", "content": error_message})
 
@@ -164,4 +185,7 @@ def render_chat_interface(session_id: str = None) -> None:
 
             st.session_state.messages.append({"role": "assistant", "content": error_message})
 
-        st.rerun()
\ No newline at end of file
+        # The results grid is outside this fragment, so new products need a full rerun
+        if _product_ids() == products_before:
+            rerun_fragment()
+        st.rerun()
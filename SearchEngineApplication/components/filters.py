@@ -0,0 +1,123 @@
+import streamlit as st
+import logging
+from utils import (
+    get_available_brands, get_available_colors, search_products, refine_session_products,
+    fetch_concurrently, rerun_fragment
+)
+
+logger = logging.getLogger(__name__)
+
+@st.fragment
+def render_filter_sidebar() -> None:
+    """
+    Render the filter sidebar. It reruns on its own when its widgets change, and only
+    reruns the whole app when it changes what the other panels show.
+    """
+    st.markdown("### 🔍 Search Filters")
+
+    if st.button("🔄 New Search", use_container_width=True):
+        logger.info("New search button clicked")
+        st.session_state.searched = False
+        st.session_state.messages = []
+        st.session_state.products = []
+        st.session_state.session_id = None
+        # Reset filters when starting new search
+        st.session_state.active_brand_filter = None
+        st.session_state.active_color_filter = None
+        st.rerun()
+
+    st.markdown("---")
+    st.markdown("#### Filter Products")
+
+    # Get original search query from session state
+    original_query = ""
+    if st.session_state.messages:
+        original_query = st.session_state.messages[0]["content"]
+
+    # Show active filters
+    active_filters = []
+    if st.session_state.active_brand_filter:
+        active_filters.append(f"🏷️ Brand: {st.session_state.active_brand_filter}")
+    if st.session_state.active_color_filter:
+        active_filters.append(f"🎨 Color: {st.session_state.active_color_filter}")
+
+    if active_filters:
+        st.markdown("**Active Filters:**")
+        for filter_text in active_filters:
+            st.markdown(f"- {filter_text}")
+
+        if st.button("🗑️ Clear Filters", use_container_width=True):
+            st.session_state.active_brand_filter = None
+            st.session_state.active_color_filter = None
+            # Widen the session's results back to its unfiltered candidates, or search
+            # again with the original query when there is no session to refine
+            if st.session_state.session_id or original_query:
+                try:
+                    with st.spinner("🔍 Searching without filters..."):
+                        if st.session_state.session_id:
+                            unfiltered_results = refine_session_products(st.session_state.session_id)
+                        else:
+                            unfiltered_results = search_products(original_query)
+
+                    if unfiltered_results and unfiltered_results.get("products"):
+                        st.session_state.products = unfiltered_results["products"]
+                        st.success(f"Filters cleared - showing all {len(unfiltered_results['products'])} results")
+                        # The results grid lives outside this fragment
+                        st.rerun()
+                except Exception as e:
+                    logger.error(f"Error clearing filters: {str(e)}")
+                    st.error("Error clearing filters")
+
+    # Facet lists are cached process-wide in utils, so only the first visitor waits
+    brands, colors = [], []
+    if st.session_state.backend_connected:
+        with st.spinner("Loading filters..."):
+            facets = dict(fetch_concurrently({"brands": get_available_brands, "colors": get_available_colors}))
+        brands = facets["brands"] or []
+        colors = facets["colors"] or []
+
+    # Brand filter
+    brand_options = ["All Brands"] + brands
+    selected_brand = st.selectbox("Brand:", brand_options, key="brand_filter")
+
+    # Color filter
+    color_options = ["All Colors"] + colors
+    selected_color = st.selectbox("Color:", color_options, key="color_filter")
+
+    # Save filters button
+    if st.button("💾 Save Filter Settings", use_container_width=True):
+        brand_filter = None if selected_brand == "All Brands" else selected_brand
+        color_filter = None if selected_color == "All Colors" else selected_color
+
+        # Store filters in session state for future searches
+        st.session_state.active_brand_filter = brand_filter
+        st.session_state.active_color_filter = color_filter
+
+        filter_description = []
+        if brand_filter:
+            filter_description.append(f"Brand: {brand_filter}")
+        if color_filter:
+            filter_description.append(f"Color: {color_filter}")
+
+        logger.info(f"Filter settings saved - Brand: {brand_filter}, Color: {color_filter}")
+
+        # With a session open, the current results are narrowed right away from the
+        # candidates the backend already holds for the session's query
+        if st.session_state.session_id:
+            with st.spinner("🔍 Applying filters..."):
+                refined_results = refine_session_products(st.session_state.session_id, brand_filter, color_filter)
+
+            if refined_results is not None:
+                st.session_state.products = refined_results.get("products", [])
+                # The results grid lives outside this fragment
+                st.rerun()
+            st.error("Error applying filters")
+
+        if filter_description:
+            st.success(f"✅ Filters saved: {', '.join(filter_description)}")
+            st.info("💡 These filters will be applied to your next search query!")
+        else:
+            st.success("✅ All filters cleared!")
+
+        # Saved filters apply to the next search, so only the sidebar needs redrawing
+        rerun_fragment()
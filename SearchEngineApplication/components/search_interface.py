@@ -1,7 +1,7 @@
 import streamlit as st
 import time
 import logging
-from utils import start_chat_session, get_session_products, get_available_brands, get_available_colors, search_products
+from utils import start_chat_session, get_session_products
 
 logger = logging.getLogger(__name__)
 
@@ -30,34 +30,35 @@ def render_search_interface():
                     status_text.markdown("🔍 **Starting AI-powered search...**")
                     progress_bar.progress(25)
 
-                    try:
-                        # Check for filters and existing session
-                        active_brand = getattr(st.session_state, 'active_brand_filter', None)
-                        active_color = getattr(st.session_state, 'active_color_filter', None)
-
-                        # Check if we have an existing session and no filters have changed
-                        has_existing_session = hasattr(st.session_state, 'session_id') and st.session_state.session_id
-
-                        # Always create a fresh session with current search context
-                        # This ensures the AI always gets the most recent search results
-                        if active_brand or active_color:
-                            status_text.markdown("🤖 **Connecting to AI assistant with filters...**")
-                            chat_response = start_chat_session(
-                                search_query,
-                                brand_filter=active_brand,
-                                color_filter=active_color
-                            )
-                        else:
-                            status_text.markdown("🤖 **Connecting to AI assistant...**")
-                            chat_response = start_chat_session(search_query)
+                    # Check for filters and existing session
+                    active_brand = getattr(st.session_state, 'active_brand_filter', None)
+                    active_color = getattr(st.session_state, 'active_color_filter', None)
 
-                        session_id = chat_response["session_id"]
+                    # Check if we have an existing session and no filters have changed
+                    has_existing_session = hasattr(st.session_state, 'session_id') and st.session_state.session_id
 
-                        progress_bar.progress(75)
+                    # Always create a fresh session with current search context
+                    # This ensures the AI always gets the most recent search results
+                    # The response carries the products the backend searched for the session,
+                    # so the grid shows exactly what the AI summary describes
+                    if active_brand or active_color:
+                        status_text.markdown("🤖 **Searching and connecting to AI assistant with filters...**")
+                    else:
+                        status_text.markdown("🤖 **Searching and connecting to AI assistant...**")
+
+                    search_results = None
+                    try:
+                        chat_response = start_chat_session(search_query, brand_filter=active_brand, color_filter=active_color)
 
                         if not chat_response:
                             raise Exception("Failed to start chat session")
 
+                        session_id = chat_response["session_id"]
+                        if "products" in chat_response:
+                            search_results = {"products": chat_response["products"]}
+
+                        progress_bar.progress(75)
+
                     except Exception as e:
                         progress_container.empty()
                         st.error(f"❌ Search failed: {str(e)}")
@@ -75,10 +76,12 @@ def render_search_interface():
                         status_text = st.empty()
 
                         try:
-                            status_text.markdown("📦 **Getting search results...**")
+                            if search_results is None:
+                                status_text.markdown("📦 **Getting search results...**")
 
-                            # Get session products (backend already performed the search with correct filters)
-                            search_results = get_session_products(session_id)
+                                # Older backends do not return products with the session, so look them up
+                                # (backend already performed the search with correct filters)
+                                search_results = get_session_products(session_id)
 
                             progress_bar.progress(100)
 
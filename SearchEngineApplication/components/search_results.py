@@ -1,103 +1,69 @@
 import streamlit as st
-from streamlit_modal import Modal
+import html
 import logging
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 logger = logging.getLogger(__name__)
 
-def render_product_card(product: Dict) -> None:
-    """Render an individual product card with modal details"""
+def _product_card_html(product: Dict) -> str:
+    """Build the HTML for one product card, with its details in a native <details> element"""
     rating = product.get("rating", 0)
     stars = "⭐" * int(rating) + "☆" * (5 - int(rating)) if rating > 0 else "No rating"
 
-    color_display = product.get('color', 'N/A') if product.get('color') else 'N/A'
-    price_display = product.get('price', 'Price not available')
+    title = html.escape(product['title'])
+    brand = html.escape(product['brand'])
+    color_display = html.escape(product.get('color') or 'N/A')
+    price_display = html.escape(product.get('price', 'Price not available'))
 
     # Truncate title for header display
-    display_title = product['title'][:20] + '...' if len(product['title']) > 20 else product['title']
-
-    # Create modal first
-    modal_title = product['title'][:20] + '...' if len(product['title']) > 20 else product['title']
-    modal = Modal(modal_title, key=f"modal_{product['id']}", padding=20, max_width=700)
-
-    # Create card structure with content and button in proper layout
-    st.markdown(
-        f"""
+    display_title = html.escape(product['title'][:20] + '...' if len(product['title']) > 20 else product['title'])
+
+    # Compact summary precomputed at ingestion time
+    if product.get('summary'):
+        text_label, text = "Summary", html.escape(product['summary'])
+    # Description with character limit (collections ingested before product_summary existed)
+    elif product.get('description'):
+        clean_description = product['description'].replace('<br>', '\n').replace('<BR>', '\n')
+        if len(clean_description) > 400:
+            clean_description = clean_description[:400] + "..."
+        text_label, text = "Description", html.escape(clean_description)
+    else:
+        text_label, text = "", ""
+
+    text_html = f'<div class="card-details-text"><strong>{text_label}:</strong><br>{text}</div>' if text else ""
+
+    card = f"""
         <div class="card product-card">
             <div class="card-content">
-                <div class="card-title">{display_title}</div>
-                <div class="card-brand">{product['brand']}</div>
+                <div class="card-title" title="{title}">{display_title}</div>
+                <div class="card-brand">{brand}</div>
                 <div style="color: #94A3B8; margin-top: 0.5rem;">
                     Color: {color_display} | {price_display}
                 </div>
             </div>
+            <details class="card-details">
+                <summary>View Details</summary>
+                <div class="card-details-body">
+                    <div><strong>Product:</strong> {title}</div>
+                    <div><strong>Brand:</strong> {brand} &nbsp; <strong>Color:</strong> {color_display}</div>
+                    <div><strong>Product Code:</strong> {html.escape(str(product['id']))}</div>
+                    <div><strong>Price:</strong> {price_display} &nbsp; <strong>Rating:</strong> {stars}</div>
+                    {text_html}
+                </div>
+            </details>
         </div>
-        """,
-        unsafe_allow_html=True
-    )
-
-    # Add button below the card content, right-aligned
-    _, button_col = st.columns([2, 1])
-    with button_col:
-        if st.button("View Details", key=f"details_{product['id']}", type="primary", use_container_width=True):
-            logger.info(f"Opening modal for product: {product['title']}")
-            modal.open()
-
-    if modal.is_open():
-        with modal.container():
-            # Add custom CSS for the modal
-            st.markdown(
-                """
-                <style>
-                .modal-content-container {
-                    max-height: 500px;
-                    overflow-y: auto;
-                    padding-right: 10px;
-                }
-                .modal-content-container::-webkit-scrollbar {
-                    width: 8px;
-                }
-                .modal-content-container::-webkit-scrollbar-track {
-                    background: #1E293B;
-                    border-radius: 4px;
-                }
-                .modal-content-container::-webkit-scrollbar-thumb {
-                    background: #14B8A6;
-                    border-radius: 4px;
-                }
-                .modal-content-container::-webkit-scrollbar-thumb:hover {
-                    background: #0F766E;
-                }
-                </style>
-                """,
-                unsafe_allow_html=True
-            )
-
-            # Create scrollable container
-            st.markdown('<div class="modal-content-container">', unsafe_allow_html=True)
-
-            # Main details in a clean layout
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown(f"**Brand:** {product['brand']}")
-                st.markdown(f"**Color:** {color_display}")
-
-            with col2:
-                st.markdown(f"**Product Code:** {product['id']}")
-                st.markdown(f"**Price:** {price_display}")
-
-            # Description with character limit
-            if product.get('description'):
-                st.markdown("---")
-                st.markdown("**Description:**")
-                # Remove HTML tags and limit characters
-                clean_description = product['description'].replace('<br>', '\n').replace('<BR>', '\n')
-                if len(clean_description) > 400:
-                    clean_description = clean_description[:400] + "..."
-                st.markdown(clean_description)
-
-            st.markdown('</div>', unsafe_allow_html=True)
+    """
+    # Markdown would treat indented or blank lines inside the block as code, so emit one line
+    return "".join(line.strip() for line in card.splitlines())
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def build_grid_html(product_ids: Tuple[str, ...], _products: List[Dict]) -> str:
+    """
+    Build every card as one HTML block. Cached on the product IDs, so reruns that do not
+    change the results (such as chat turns) reuse the same fragment.
+    """
+    cards = "".join(_product_card_html(product) for product in _products)
+    return f'<div class="product-grid">{cards}</div>'
 
 def render_search_results(products: List[Dict]) -> None:
     """Render the complete search results section"""
@@ -107,15 +73,9 @@ def render_search_results(products: List[Dict]) -> None:
 
     results_container = st.container(height=800, border=False)
     with results_container:
-        # Add padding wrapper to prevent card hover overflow
-        st.markdown('<div style="padding: 1.5rem; margin: 0.5rem;">', unsafe_allow_html=True)
         if products:
-            grid_cols = st.columns(2)
-            for i, product in enumerate(products):
-                with grid_cols[i % 2]:
-                    render_product_card(product)
+            product_ids = tuple(str(product['id']) for product in products)
+            st.markdown(build_grid_html(product_ids, products), unsafe_allow_html=True)
         else:
             logger.warning("No products to display")
             st.info("No products found.")
-
-        st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
@@ -1,12 +1,68 @@
+import json
+import threading
 import requests
 import streamlit as st
 import logging
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from streamlit.errors import StreamlitAPIException
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+try:
+    from websockets.exceptions import WebSocketException
+    from websockets.sync.client import connect as websocket_connect
+except ImportError:  # Without websockets, chat messages are sent over HTTP
+    websocket_connect = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 BACKEND_URL = "http://localhost:8000"
+BACKEND_WS_URL = BACKEND_URL.replace("http", "ws", 1)
+
+# Connections kept alive to the backend, shared by every browser session of this process
+HTTP_POOL_MAXSIZE = 20
+# Facet lists and health are cached for the whole process, not per browser session
+FACET_CACHE_TTL_SECONDS = 600
+HEALTH_CACHE_TTL_SECONDS = 10
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Return the process-wide keep-alive HTTP session used for all backend calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    logger.info(f"Created pooled HTTP session for {BACKEND_URL}")
+    return session
+
+def rerun_fragment() -> None:
+    """Rerun only the calling fragment, or the whole app if this is not a fragment rerun"""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+def fetch_concurrently(calls: Dict[str, Callable[[], Any]]) -> Iterator[Tuple[str, Any]]:
+    """
+    Run independent backend calls at the same time and yield (name, result) pairs in the
+    order they finish, so each result can be rendered as soon as it arrives. The calls
+    run with the current script context, so their st.error messages still show up.
+
+    Each call gets its own short-lived thread, so slow calls of one visitor never queue
+    behind another's, and no thread outlives the script context attached to it.
+    """
+    ctx = get_script_run_ctx()
+
+    def run_with_context(call: Callable[[], Any]) -> Any:
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call()
+
+    with ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="backend-fetch") as pool:
+        futures = {pool.submit(run_with_context, call): name for name, call in calls.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
 
 def start_chat_session(query: str, user_id: str = None, brand_filter: str = None, color_filter: str = None) -> Optional[Dict]:
     """Start a new chat session with the backend"""
@@ -23,7 +79,7 @@ def start_chat_session(query: str, user_id: str = None, brand_filter: str = None
 
         logger.info(f"FRONTEND: Full payload being sent: {payload}")
 
-        response = requests.post(
+        response = get_http_session().post(
             f"{BACKEND_URL}/chat/start",
             json=payload,
             timeout=120  # Increased to match backend Weaviate timeouts
@@ -74,7 +130,7 @@ def send_chat_message(session_id: str, message: str, user_id: str = None, brand_
 
         logger.info(f"Sending chat message with filters - Brand: {brand_filter}, Color: {color_filter}")
 
-        response = requests.post(
+        response = get_http_session().post(
             f"{BACKEND_URL}/chat/message",
             json=payload,
             timeout=120  # Increased to match backend processing time
@@ -116,6 +172,88 @@ def send_chat_message(session_id: str, message: str, user_id: str = None, brand_
         st.error(f"❌ {error_msg}")
         return None
 
+def _close_chat_socket() -> None:
+    entry = st.session_state.pop("chat_socket", None)
+    if entry:
+        try:
+            entry[1].close()
+        except Exception:
+            pass
+
+def _get_chat_socket(session_id: str):
+    """Return this browser session's open chat socket for session_id, connecting on first use"""
+    entry = st.session_state.get("chat_socket")
+    if entry and entry[0] == session_id:
+        return entry[1]
+
+    _close_chat_socket()
+    connection = websocket_connect(f"{BACKEND_WS_URL}/chat/ws/{session_id}", open_timeout=10)
+    event = json.loads(connection.recv(timeout=30))
+    if event.get("type") != "session":
+        connection.close()
+        raise LookupError(event.get("detail", "Chat session not found"))
+
+    logger.info(f"Opened chat socket for session {session_id}")
+    st.session_state.chat_socket = (session_id, connection)
+    return connection
+
+def stream_chat_message(
+    session_id: str,
+    message: str,
+    on_token: Callable[[str], None],
+    user_id: str = None,
+    brand_filter: str = None,
+    color_filter: str = None
+) -> Optional[Dict]:
+    """
+    Send a message over the session's persistent WebSocket, calling on_token with each
+    piece of the reply as it streams. The result also carries the refreshed products.
+    Falls back to send_chat_message (no streaming, no products) if the socket is unavailable.
+    """
+    if websocket_connect is None:
+        return send_chat_message(session_id, message, user_id, brand_filter, color_filter)
+
+    payload = {"message": message, "user_id": user_id, "brand_filter": brand_filter, "color_filter": color_filter}
+    try:
+        connection = _get_chat_socket(session_id)
+        connection.send(json.dumps(payload))
+    except LookupError as e:
+        logger.error(f"Chat socket rejected: {str(e)}")
+        st.error("❌ Chat session not found. Please start a new conversation.")
+        return None
+    except (OSError, TimeoutError, WebSocketException) as e:
+        # Nothing was sent, so the message can safely go over HTTP instead
+        logger.warning(f"Chat socket unavailable, falling back to HTTP: {str(e)}")
+        _close_chat_socket()
+        return send_chat_message(session_id, message, user_id, brand_filter, color_filter)
+
+    result = {"session_id": session_id, "status": "success"}
+    try:
+        while True:
+            event = json.loads(connection.recv(timeout=120))
+            if event["type"] == "products":
+                result["products"] = event["products"]
+                result["search_query_used"] = event["search_query"]
+            elif event["type"] == "token":
+                on_token(event["delta"])
+            elif event["type"] == "done":
+                result["user_message"] = event["user_message"]
+                result["assistant_response"] = event["assistant_response"]
+                logger.info(f"Message streamed successfully to session {session_id}")
+                return result
+            elif event["type"] == "error":
+                logger.error(f"Chat socket error: {event['detail']}")
+                st.error(f"❌ {event['detail']}")
+                return None
+
+    except (OSError, TimeoutError, WebSocketException) as e:
+        # The message may already have been processed, so it is not resent
+        error_msg = f"Connection to the backend was lost: {str(e)}"
+        logger.error(error_msg)
+        _close_chat_socket()
+        st.error(f"❌ {error_msg}")
+        return None
+
 def search_products(query: str, limit: int = 10, brand_filter: str = None, color_filter: str = None) -> Optional[Dict]:
     """Search for products using the backend Weaviate semantic search"""
     try:
@@ -131,7 +269,7 @@ def search_products(query: str, limit: int = 10, brand_filter: str = None, color
         if color_filter:
             payload["color_filter"] = color_filter
 
-        response = requests.post(
+        response = get_http_session().post(
             f"{BACKEND_URL}/search",
             json=payload,
             timeout=120  # Increased to match Weaviate query timeouts
@@ -168,21 +306,19 @@ def search_products(query: str, limit: int = 10, brand_filter: str = None, color
         st.error(f"❌ {error_msg}")
         return None
 
+@st.cache_data(ttl=FACET_CACHE_TTL_SECONDS, show_spinner=False)
+def _fetch_facet(name: str) -> list:
+    """Fetch /search/{name}; failures raise, so only successful responses are cached"""
+    response = get_http_session().get(f"{BACKEND_URL}/search/{name}", timeout=120)  # Increased for Weaviate aggregate queries
+    response.raise_for_status()
+    return response.json().get(name, [])
+
 def get_available_brands() -> Optional[list]:
     """Get available product brands from the backend"""
     try:
-        logger.info("Fetching available brands")
-
-        response = requests.get(f"{BACKEND_URL}/search/brands", timeout=120)  # Increased for Weaviate aggregate queries
-
-        if response.status_code == 200:
-            result = response.json()
-            brands = result.get("brands", [])
-            logger.info(f"Fetched {len(brands)} available brands")
-            return brands
-        else:
-            logger.error(f"Failed to fetch brands with status {response.status_code}")
-            return []
+        brands = _fetch_facet("brands")
+        logger.info(f"Fetched {len(brands)} available brands")
+        return brands
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching brands: {str(e)}")
@@ -191,18 +327,9 @@ def get_available_brands() -> Optional[list]:
 def get_available_colors() -> Optional[list]:
     """Get available product colors from the backend"""
     try:
-        logger.info("Fetching available colors")
-
-        response = requests.get(f"{BACKEND_URL}/search/colors", timeout=120)  # Increased for Weaviate aggregate queries
-
-        if response.status_code == 200:
-            result = response.json()
-            colors = result.get("colors", [])
-            logger.info(f"Fetched {len(colors)} available colors")
-            return colors
-        else:
-            logger.error(f"Failed to fetch colors with status {response.status_code}")
-            return []
+        colors = _fetch_facet("colors")
+        logger.info(f"Fetched {len(colors)} available colors")
+        return colors
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching colors: {str(e)}")
@@ -213,7 +340,7 @@ def get_session_products(session_id: str) -> Optional[Dict]:
     try:
         logger.info(f"Getting products for session: {session_id}")
 
-        response = requests.get(f"{BACKEND_URL}/chat/{session_id}/products", timeout=60)  # Increased for session lookup
+        response = get_http_session().get(f"{BACKEND_URL}/chat/{session_id}/products", timeout=60)  # Increased for session lookup
 
         if response.status_code == 200:
             result = response.json()
@@ -228,12 +355,36 @@ def get_session_products(session_id: str) -> Optional[Dict]:
         logger.error(f"Error getting session products: {str(e)}")
         return None
 
+def refine_session_products(session_id: str, brand_filter: str = None, color_filter: str = None, limit: int = 10) -> Optional[Dict]:
+    """Narrow a chat session's products to new filters; the backend answers from the session's candidate pool"""
+    try:
+        logger.info(f"Refining products for session {session_id} - Brand: {brand_filter}, Color: {color_filter}")
+
+        response = get_http_session().post(
+            f"{BACKEND_URL}/chat/{session_id}/refine",
+            json={"brand_filter": brand_filter, "color_filter": color_filter, "limit": limit},
+            timeout=120  # Only falls back to a Weaviate query when the pool is too small
+        )
+
+        if response.status_code == 200:
+            result = response.json()
+            logger.info(f"Refined session {session_id} to {len(result.get('products', []))} products")
+            return result
+        else:
+            logger.error(f"Failed to refine session products with status {response.status_code}")
+            return None
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error refining session products: {str(e)}")
+        return None
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL_SECONDS, show_spinner=False)
 def check_backend_health() -> bool:
     """Check if the backend server is running and healthy"""
     try:
         logger.info("Checking backend health")
 
-        response = requests.get(f"{BACKEND_URL}/", timeout=5)
+        response = get_http_session().get(f"{BACKEND_URL}/", timeout=5)
         is_healthy = response.status_code == 200
 
         if is_healthy: